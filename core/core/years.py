@@ -0,0 +1,122 @@
+"""
+Year/month helpers shared by the apps: database-generated period columns,
+and a cached per-model year index used by the admin Year filters and the
+report year dropdowns. Each (model, field) pair keeps its sorted list of
+distinct years in the Django cache; saves and deletes on the model keep it
+current, so changelists and reports don't scan the table on every load.
+"""
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import models
+from django.db.models.functions import ExtractYear, ExtractMonth
+from django.db.models.signals import post_save, post_delete
+
+YEAR_INDEX_TIMEOUT = 60 * 60 * 6
+
+
+def period_columns(date_field):
+    """
+    Stored, database-generated (year, month) columns derived from
+    `date_field`, so bulk_create, queryset.update() and imports keep them
+    right without going through save(). Use as `year, month = period_columns('x_date')`.
+    """
+    return (
+        models.GeneratedField(expression=ExtractYear(date_field), output_field=models.PositiveIntegerField(), db_persist=True),
+        models.GeneratedField(expression=ExtractMonth(date_field), output_field=models.PositiveIntegerField(), db_persist=True),
+    )
+
+
+def _cache_key(model, field):
+    return f'year-index:{model._meta.label_lower}:{field}'
+
+
+def _is_date_field(model, field):
+    return isinstance(model._meta.get_field(field), models.DateField)
+
+
+def _year_of(value):
+    return getattr(value, 'year', value)
+
+
+def _source_field(model, field):
+    """
+    The attribute holding `field`'s value right after a save: the date a
+    generated year column is extracted from (generated columns aren't
+    reloaded on every backend), else the field itself.
+    """
+    model_field = model._meta.get_field(field)
+    expression = getattr(model_field, 'expression', None)
+    if isinstance(model_field, models.GeneratedField) and isinstance(expression, ExtractYear):
+        return model._meta.get_field(expression.lhs.name).attname
+    return model_field.attname
+
+
+def year_index(model, field='year', descending=False):
+    """Distinct years for `field` (an integer year or a date field)."""
+    register_year_index(model, field)
+    key = _cache_key(model, field)
+    years = cache.get(key)
+    if years is None:
+        if _is_date_field(model, field):
+            years = [d.year for d in model.objects.dates(field, 'year')]
+        else:
+            values = model.objects.order_by(field).values_list(field, flat=True).distinct()
+            years = [y for y in values if y]
+        cache.set(key, years, YEAR_INDEX_TIMEOUT)
+    return list(reversed(years)) if descending else list(years)
+
+
+def invalidate_year_index(model, field='year'):
+    """Drop the cached years, e.g. after a bulk_create/update that skips signals."""
+    cache.delete(_cache_key(model, field))
+
+
+def register_year_index(model, field='year'):
+    """Keep the index for (model, field) in step with saves and deletes. Idempotent."""
+    key = _cache_key(model, field)
+    source = _source_field(model, field)
+
+    def saved(sender, instance, created, **kwargs):
+        years = cache.get(key)
+        if years is None:
+            return
+        # a new row in a known year changes nothing; edits may move a row out of its
+        # year. Read the year from the source date so generated columns aren't fetched.
+        if created and _year_of(instance.__dict__.get(source)) in years:
+            return
+        cache.delete(key)
+
+    def deleted(sender, instance, **kwargs):
+        cache.delete(key)
+
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=f'{key}:save')
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=f'{key}:delete')
+
+
+class YearIndexListFilter(admin.SimpleListFilter):
+    """
+    Year sidebar filter backed by the cached year index. Subclasses set
+    `year_model` (and `year_field` when it isn't `year`).
+    """
+    title = 'Year'
+    parameter_name = 'year'
+    template = 'admin/select_filter.html'  # Use select box
+    year_model = None
+    year_field = 'year'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.year_model is not None:
+            register_year_index(cls.year_model, cls.year_field)
+
+    def lookups(self, request, model_admin):
+        years = year_index(self.year_model, self.year_field, descending=True)
+        return [(y, str(y)) for y in years]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            lookup = self.year_field
+            if _is_date_field(self.year_model, self.year_field):
+                lookup = f'{self.year_field}__year'
+            return queryset.filter(**{lookup: int(self.value())})
+        return queryset
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Needy, Payment, Bank
+from .models import Needy, Payment, Bank, invalidate_cash_position
+from .periods import MAX_MONTHS, months_between
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin, ExportActionMixin
 from django.db.models import Sum
@@ -9,6 +10,7 @@ from django.template.response import TemplateResponse
 from django import forms
 from django.urls import path
 from django.shortcuts import render, redirect
+from core.years import YearIndexListFilter
 
 
 try:
@@ -69,6 +71,36 @@ class GeneratePaymentsForm(forms.Form):
         label="Year"
     )
 
+class GeneratePaymentsRangeForm(forms.Form):
+    MONTH_CHOICES = [(i, datetime.date(2000, i, 1).strftime('%B')) for i in range(1, 13)]
+
+    start_month = forms.ChoiceField(choices=MONTH_CHOICES, label="From month")
+    start_year = forms.IntegerField(initial=datetime.datetime.now().year, label="From year")
+    end_month = forms.ChoiceField(choices=MONTH_CHOICES, label="To month")
+    end_year = forms.IntegerField(initial=datetime.datetime.now().year, label="To year")
+    categories = forms.MultipleChoiceField(
+        choices=[c for c in Needy.CATEGORY_CHOICES if c[0] in Payment.SCHEDULED_CATEGORIES],
+        initial=list(Payment.SCHEDULED_CATEGORIES),
+        widget=forms.CheckboxSelectMultiple,
+        label="Categories",
+    )
+
+    # keep one request from generating decades of payments by mistake
+    MAX_MONTHS = MAX_MONTHS
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        start = (cleaned_data['start_year'], int(cleaned_data['start_month']))
+        end = (cleaned_data['end_year'], int(cleaned_data['end_month']))
+        if end < start:
+            raise forms.ValidationError("The end month must not be before the start month.")
+        if months_between(start, end) > self.MAX_MONTHS:
+            raise forms.ValidationError(f"Generate at most {self.MAX_MONTHS} months at a time.")
+        cleaned_data['start'], cleaned_data['end'] = start, end
+        return cleaned_data
+
 class MonthNameListFilter(admin.SimpleListFilter):
     title = 'Month'
     parameter_name = 'month'
@@ -83,19 +115,8 @@ class MonthNameListFilter(admin.SimpleListFilter):
             return queryset.filter(month=int(self.value()))
         return queryset
 
-class YearListFilter(admin.SimpleListFilter):
-    title = 'Year'
-    parameter_name = 'year'
-    template = 'admin/select_filter.html'  # Use select box
-
-    def lookups(self, request, model_admin):
-        years = Payment.objects.values_list('year', flat=True).distinct().order_by('-year')
-        return [(year, year) for year in years if year]
-
-    def queryset(self, request, queryset):
-        if self.value():
-            return queryset.filter(year=int(self.value()))
-        return queryset
+class YearListFilter(YearIndexListFilter):
+    year_model = Payment
 
 @admin.register(Payment)
 class PaymentAdmin(ImportExportModelAdmin, ExportActionMixin):
@@ -109,11 +130,13 @@ class PaymentAdmin(ImportExportModelAdmin, ExportActionMixin):
     
     def mark_as_paid(self, request, queryset):
         updated = queryset.update(status='paid')
+        invalidate_cash_position()
         self.message_user(request, f"{updated} payment(s) marked as paid.")
     mark_as_paid.short_description = "Mark selected payments as Paid"
 
     def mark_as_pending(self, request, queryset):
         updated = queryset.update(status='pending')
+        invalidate_cash_position()
         self.message_user(request, f"{updated} payment(s) marked as pending.")
     mark_as_pending.short_description = "Mark selected payments as Pending"
     
@@ -126,6 +149,7 @@ class PaymentAdmin(ImportExportModelAdmin, ExportActionMixin):
     def changelist_view(self, request, extra_context=None):
         extra_context = extra_context or {}
         extra_context['generate_payments_url'] = 'generate_monthly_payments/'
+        extra_context['generate_range_url'] = 'generate_payments_range/'
         response = super().changelist_view(request, extra_context=extra_context)
         if not hasattr(response, 'context_data') or response.context_data is None:
             return response
@@ -145,6 +169,7 @@ class PaymentAdmin(ImportExportModelAdmin, ExportActionMixin):
         urls = super().get_urls()
         custom_urls = [
             path('generate_monthly_payments/', self.admin_site.admin_view(self.generate_monthly_payments), name='generate_monthly_payments'),
+            path('generate_payments_range/', self.admin_site.admin_view(self.generate_payments_range), name='generate_payments_range'),
         ]
         return custom_urls + urls
     
@@ -158,30 +183,19 @@ class PaymentAdmin(ImportExportModelAdmin, ExportActionMixin):
                 # If the 'confirm' flag is in the POST data, it's the confirmation step.
                 if 'confirm' in request.POST:
                     payment_date = datetime.date(year, month, 1)
-                    needies = Needy.objects.filter(status='active', category='monthly')
-                    created_count = 0
-                    for needyer in needies:
-                        # Double-check existence to be safe and avoid duplicates
-                        if not Payment.objects.filter(needy=needyer, year=year, month=month).exists():
-                            Payment.objects.create(
-                                needy=needyer,
-                                amount=needyer.amount,
-                                payment_date=payment_date,
-                                year=year,
-                                month=month,
-                                status='pending'
-                            )
-                            created_count += 1
+                    created_count = Payment.generate_pending(year, month)
                     messages.success(request, f"{created_count} payments were successfully generated for {payment_date.strftime('%B %Y')}.")
                     return redirect('admin:fund_payment_changelist')
 
                 # Otherwise, it's the first submission. Show the confirmation page.
                 else:
-                    active_monthly_needyers = Needy.objects.filter(status='active', category='monthly')
+                    # evaluate the needies once and split them by the month's existing payments
+                    active_monthly_needyers = list(
+                        Needy.objects.filter(status='active', category='monthly').only('id', 'name', 'amount')
+                    )
                     existing_payment_needy_ids = set(Payment.objects.filter(
                         year=year,
                         month=month,
-                        needy__in=active_monthly_needyers
                     ).values_list('needy_id', flat=True))
 
                     needyers_to_pay = [s for s in active_monthly_needyers if s.id not in existing_payment_needy_ids]
@@ -194,6 +208,7 @@ class PaymentAdmin(ImportExportModelAdmin, ExportActionMixin):
                         year=year,
                         needyers_to_pay=needyers_to_pay,
                         needyers_with_existing_payment=needyers_with_existing_payment,
+                        total_to_pay=sum(s.amount for s in needyers_to_pay),
                         opts=self.model._meta, # For breadcrumbs
                     )
                     return render(request, "admin/payment/generate_monthly_payments_confirm.html", context)
@@ -207,6 +222,49 @@ class PaymentAdmin(ImportExportModelAdmin, ExportActionMixin):
         )
         return render(request, "admin/payment/generate_monthly_payments.html", context)
 
+    def generate_payments_range(self, request):
+        form = GeneratePaymentsRangeForm(request.POST or None)
+        if request.method == 'POST' and form.is_valid():
+            start, end = form.cleaned_data['start'], form.cleaned_data['end']
+            categories = form.cleaned_data['categories']
+            period_label = f"{datetime.date(*start, 1).strftime('%B %Y')} - {datetime.date(*end, 1).strftime('%B %Y')}"
+
+            if 'confirm' in request.POST:
+                created_count = Payment.generate_range(start, end, categories)
+                messages.success(request, f"{created_count} payments were successfully generated for {period_label}.")
+                return redirect('admin:fund_payment_changelist')
+
+            # preview: what is missing per month and category, one grouped query
+            category_names = dict(Needy.CATEGORY_CHOICES)
+            rows = []
+            total_count, total_amount = 0, 0
+            for year, month, category, count, amount in Payment.missing_summary(start, end, categories):
+                rows.append({
+                    'period': datetime.date(year, month, 1).strftime('%B %Y'),
+                    'category': category_names.get(category, category),
+                    'count': count,
+                    'amount': amount,
+                })
+                total_count += count
+                total_amount += amount
+            context = dict(
+                self.admin_site.each_context(request),
+                form=form,
+                rows=rows,
+                total_count=total_count,
+                total_amount=total_amount,
+                period_label=period_label,
+                opts=self.model._meta, # For breadcrumbs
+            )
+            return render(request, "admin/payment/generate_payments_range_confirm.html", context)
+
+        context = dict(
+            self.admin_site.each_context(request),
+            form=form,
+            opts=self.model._meta, # For breadcrumbs
+        )
+        return render(request, "admin/payment/generate_payments_range.html", context)
+
 class BankResource(resources.ModelResource):
 
     class Meta:
@@ -0,0 +1,117 @@
+"""
+Fund obligation forecast: the money needed each month to pay every active
+monthly and annual Needy, compared with the average monthly Bank inflow
+of a trailing window. Needy amounts and categories are read once into
+NumPy arrays and the needy x month schedule is computed with array
+operations.
+
+NumPy is an optional dependency; callers handle the ImportError raised by
+`forecast()` when it is not installed.
+"""
+from datetime import date
+from django.db.models import Exists, OuterRef, Sum
+from fund.models import Bank, Needy, Payment
+
+
+def month_index(year, month):
+    return year * 12 + month - 1
+
+
+def index_date(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def load_commitments(start_year, location=None):
+    """
+    Active monthly and annual needies as parallel lists (one query):
+    amounts, annual flags, and whether the annual payment of `start_year`
+    already exists.
+    """
+    needies = Needy.objects.filter(status='active', category__in=Payment.SCHEDULED_CATEGORIES)
+    if location:
+        needies = needies.filter(location=location)
+    needies = needies.annotate(
+        paid_in_start_year=Exists(Payment.objects.filter(needy=OuterRef('pk'), year=start_year)),
+    )
+    amounts, annual, paid = [], [], []
+    for amount, category, paid_in_start_year in needies.values_list('amount', 'category', 'paid_in_start_year').iterator():
+        amounts.append(float(amount))
+        annual.append(category == 'annually')
+        paid.append(bool(paid_in_start_year))
+    return amounts, annual, paid
+
+
+def trailing_inflow(current, trailing):
+    """Average monthly Bank deposit over the `trailing` complete months before month index `current`."""
+    total = Bank.objects.filter(
+        date__gte=index_date(current - trailing), date__lt=index_date(current),
+    ).aggregate(total=Sum('amount'))['total']
+    return float(total or 0) / trailing
+
+
+def forecast(months=12, trailing=12, location=None, start=None):
+    """
+    Project obligations for `months` periods from `start` (a (year, month)
+    tuple, default next month). Monthly needies are due every month; annual
+    ones in January, or in the first month when that year's payment is
+    still missing, as in Payment.generate_range. Returns a dict with
+    `periods` and per-month `monthly`, `annual`, `obligations`, `inflow`,
+    `shortfall` and `cumulative` arrays.
+    """
+    import numpy as np
+
+    if start is None:
+        today = date.today()
+        first = month_index(today.year, today.month) + 1
+    else:
+        first = month_index(*start)
+    period_index = np.arange(first, first + months)
+
+    amounts, annual, paid = load_commitments(first // 12, location)
+    amounts = np.asarray(amounts, dtype=float)
+    annual = np.asarray(annual, dtype=bool)
+    paid = np.asarray(paid, dtype=bool)
+
+    # (needy, month) due flags; a payment already made in the start year
+    # covers that year's January as well as the catch-up month
+    january = (period_index % 12 == 0)[None, :]
+    in_start_year = (period_index // 12 == first // 12)[None, :]
+    catch_up = (period_index == first)[None, :] & ~paid[:, None]
+    due = np.where(annual[:, None], (january & ~(paid[:, None] & in_start_year)) | catch_up, True)
+    scheduled = amounts[:, None] * due
+    monthly = scheduled[~annual].sum(axis=0)
+    annual_total = scheduled[annual].sum(axis=0)
+    obligations = monthly + annual_total
+
+    # compare against the trailing average of complete months before the forecast
+    average = trailing_inflow(first - 1, trailing)
+    inflow = np.full(months, average)
+    shortfall = obligations - inflow
+
+    return {
+        'periods': [(int(i) // 12, int(i) % 12 + 1) for i in period_index],
+        'monthly': monthly,
+        'annual': annual_total,
+        'obligations': obligations,
+        'inflow': inflow,
+        'shortfall': shortfall,
+        'cumulative': np.cumsum(shortfall),
+        'trailing_average': average,
+        'needy_count': len(amounts),
+    }
+
+
+def forecast_rows(result):
+    """One dict per month with plain floats, for the template, CSV and PDF."""
+    rows = []
+    for m, (year, month) in enumerate(result['periods']):
+        rows.append({
+            'period': date(year, month, 1).strftime('%b %Y'),
+            'monthly': round(float(result['monthly'][m]), 2),
+            'annual': round(float(result['annual'][m]), 2),
+            'obligations': round(float(result['obligations'][m]), 2),
+            'inflow': round(float(result['inflow'][m]), 2),
+            'shortfall': round(float(result['shortfall'][m]), 2),
+            'cumulative': round(float(result['cumulative'][m]), 2),
+        })
+    return rows
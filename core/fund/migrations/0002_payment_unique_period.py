@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:44
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_periods(apps, schema_editor):
+    # refuse to guess which duplicate to keep; list them so they can be fixed by hand
+    Payment = apps.get_model('fund', 'Payment')
+    duplicates = list(
+        Payment.objects.order_by().values('needy_id', 'year', 'month')
+        .annotate(n=Count('id')).filter(n__gt=1)[:20]
+    )
+    if duplicates:
+        rows = ', '.join(f"needy {d['needy_id']} {d['year']}-{d['month']:02d}" for d in duplicates)
+        raise RuntimeError(f"Duplicate Payment rows must be merged before adding the unique period constraint: {rows}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fund', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_periods, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('needy', 'year', 'month'), name='unique_needy_payment_period'),
+        ),
+    ]
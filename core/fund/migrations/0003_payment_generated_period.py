@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:12
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fund', '0002_payment_unique_period'),
+    ]
+
+    # Django can't alter a regular column into a generated one, so year/month
+    # are dropped and re-added as stored generated columns
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='payment',
+            name='unique_needy_payment_period',
+        ),
+        migrations.RemoveField(model_name='payment', name='year'),
+        migrations.RemoveField(model_name='payment', name='month'),
+        migrations.AddField(
+            model_name='payment',
+            name='year',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractYear('payment_date'), output_field=models.PositiveIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='month',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractMonth('payment_date'), output_field=models.PositiveIntegerField()),
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('needy', 'year', 'month'), name='unique_needy_payment_period'),
+        ),
+    ]
@@ -1,5 +1,12 @@
-from django.db import models
+from django.db import models, transaction, connection
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from core.years import period_columns, invalidate_year_index
+from .periods import calendar_cte
+import datetime
 
 User = get_user_model()
 
@@ -51,27 +58,142 @@ class Payment(models.Model):
     needy = models.ForeignKey(Needy, on_delete=models.CASCADE, related_name='payments')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_date = models.DateField()
-    year = models.PositiveIntegerField(editable=False)
-    month = models.PositiveIntegerField(editable=False)
+    year, month = period_columns('payment_date')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='paid')
 
-    def save(self, *args, **kwargs):
-        if self.payment_date:
-            self.year = self.payment_date.year
-            self.month = self.payment_date.month
-        super().save(*args, **kwargs)
-    
+    def clean(self):
+        # year/month are not form fields, so check the unique period here
+        # instead of letting the database constraint raise on save
+        if self.payment_date and self.needy_id:
+            duplicate = Payment.objects.filter(
+                needy_id=self.needy_id, year=self.payment_date.year, month=self.payment_date.month,
+            ).exclude(pk=self.pk)
+            if duplicate.exists():
+                raise ValidationError({'payment_date': 'A payment for this needy and month already exists.'})
+
     def get_month_name(self):
         import calendar
         return calendar.month_name[self.month] if self.month else ""
     
     def __str__(self):
         return f"{self.needy.name} - {self.amount} ({self.payment_date})"
-    
+
+    # Needy categories paid on a schedule (by-need payments are entered by hand)
+    SCHEDULED_CATEGORIES = ('monthly', 'annually')
+
+    @classmethod
+    def _insert_pending(cls, rows, batch_size=1000):
+        """
+        Bulk-insert pending payments for (needy_id, amount, payment_date)
+        rows. Returns the number actually inserted: rows a concurrent run
+        created first are skipped by the unique constraint and not counted.
+        """
+        new_payments = [
+            cls(needy_id=needy_id, amount=amount, payment_date=payment_date, status='pending')
+            for needy_id, amount, payment_date in rows
+        ]
+        if not new_payments:
+            return 0
+        # every inserted row matches this; counting it before and after in
+        # the same transaction leaves out the rows ignore_conflicts skipped
+        scope = cls.objects.filter(
+            needy_id__in={p.needy_id for p in new_payments},
+            payment_date__in={p.payment_date for p in new_payments},
+        )
+        with transaction.atomic():
+            before = scope.count()
+            # the unique (needy, year, month) constraint still guards against a concurrent run
+            cls.objects.bulk_create(new_payments, batch_size=batch_size, ignore_conflicts=True)
+            created = scope.count() - before
+        if created:
+            invalidate_year_index(cls)
+            invalidate_year_index(cls, 'payment_date')
+        return created
+
+    @classmethod
+    def generate_pending(cls, year, month, needies=None, batch_size=1000):
+        """
+        Create a pending payment dated the 1st of (year, month) for every
+        needy in `needies` (default: active monthly ones) that has none for
+        that month yet. Existing payments are read with one query and the
+        rest inserted in batches. Returns the number of payments created.
+        """
+        if needies is None:
+            needies = Needy.objects.filter(status='active', category='monthly')
+        existing = set(cls.objects.filter(year=year, month=month).values_list('needy_id', flat=True))
+        payment_date = datetime.date(year, month, 1)
+        return cls._insert_pending((
+            (needy_id, amount, payment_date)
+            for needy_id, amount in needies.values_list('id', 'amount').iterator()
+            if needy_id not in existing
+        ), batch_size=batch_size)
+
+    @classmethod
+    def _missing_query(cls, start, end, categories, columns, tail=''):
+        """
+        Anti-join of active needies against the month calendar from start
+        to end. Monthly needies are due every month; annual ones once a
+        year, in January or the range's first month, and any payment in that
+        year covers them.
+        """
+        quote = connection.ops.quote_name
+        cte, params = calendar_cte(start, end)
+        placeholders = ', '.join(['%s'] * len(categories))
+        sql = f"""
+            {cte}
+            SELECT {columns}
+            FROM calendar c
+            JOIN {quote(Needy._meta.db_table)} n
+              ON n.status = 'active' AND n.category IN ({placeholders})
+             AND (n.category = 'monthly' OR c.period_month = 1 OR (c.period_year = %s AND c.period_month = %s))
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {quote(cls._meta.db_table)} p
+                WHERE p.needy_id = n.id AND p.year = c.period_year
+                  AND (n.category = 'annually' OR p.month = c.period_month)
+            )
+            {tail}
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + list(categories) + [start[0], start[1]])
+            return cursor.fetchall()
+
+    @classmethod
+    def missing_periods(cls, start, end, categories=SCHEDULED_CATEGORIES):
+        """(needy_id, amount, year, month) for every scheduled payment not yet made, in one query."""
+        return cls._missing_query(
+            start, end, categories,
+            'n.id, n.amount, c.period_year, c.period_month',
+            'ORDER BY c.period_year, c.period_month, n.id',
+        )
+
+    @classmethod
+    def missing_summary(cls, start, end, categories=SCHEDULED_CATEGORIES):
+        """(year, month, category, count, total) of the payments missing_periods would return."""
+        return cls._missing_query(
+            start, end, categories,
+            'c.period_year, c.period_month, n.category, COUNT(*), SUM(n.amount)',
+            'GROUP BY c.period_year, c.period_month, n.category ORDER BY c.period_year, c.period_month, n.category',
+        )
+
+    @classmethod
+    def generate_range(cls, start, end, categories=SCHEDULED_CATEGORIES, batch_size=1000):
+        """
+        Create every missing pending payment for the months from `start`
+        through `end` ((year, month) tuples), dated the 1st of the month.
+        Returns the number of payments created.
+        """
+        return cls._insert_pending((
+            (needy_id, amount, datetime.date(year, month, 1))
+            for needy_id, amount, year, month in cls.missing_periods(start, end, categories)
+        ), batch_size=batch_size)
+
     class Meta:
         ordering = ['-payment_date']
         verbose_name_plural = 'Payments'
         verbose_name = 'Payment'
+        constraints = [
+            models.UniqueConstraint(fields=['needy', 'year', 'month'], name='unique_needy_payment_period'),
+        ]
         
         
 ## Bank Model
@@ -83,4 +205,31 @@ class Bank(models.Model):
     comments = models.TextField(blank=True)
 
     def __str__(self):
-        return f"Bank: {self.amount} paid by {self.paid_by} received by {self.received_by} on {self.date}"
\ No newline at end of file
+        return f"Bank: {self.amount} paid by {self.paid_by} received by {self.received_by} on {self.date}"
+
+
+# The cash-position report caches its series per filter set under the
+# current generation; bumping the generation drops every cached series.
+CASH_POSITION_CACHE_KEY = 'fund:cash-position'
+CASH_POSITION_TIMEOUT = 60 * 60
+
+
+def cash_position_cache_key(*filters):
+    generation = cache.get_or_set(f'{CASH_POSITION_CACHE_KEY}:generation', 1, None)
+    return ':'.join([CASH_POSITION_CACHE_KEY, str(generation)] + [str(f) for f in filters])
+
+
+def invalidate_cash_position():
+    """Drop the cached series, e.g. after a queryset.update() that skips signals."""
+    try:
+        cache.incr(f'{CASH_POSITION_CACHE_KEY}:generation')
+    except ValueError:
+        cache.set(f'{CASH_POSITION_CACHE_KEY}:generation', 1, None)
+
+
+@receiver(post_save, sender=Bank)
+@receiver(post_delete, sender=Bank)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def bank_or_payment_changed(sender, **kwargs):
+    invalidate_cash_position()
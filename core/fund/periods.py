@@ -0,0 +1,45 @@
+"""
+Month calendar helpers for the fund app. `calendar_cte` renders a
+recursive CTE with one (period_year, period_month) row per month in a
+range, so payment coverage can be checked set-based in SQL (anti-joins,
+gap listings) instead of looping over needies and months in Python.
+Recursive CTEs are supported by MySQL 8+ and SQLite 3.8.3+.
+"""
+
+# the longest month range one request may cover; also well under MySQL's
+# default cte_max_recursion_depth (1000)
+MAX_MONTHS = 120
+
+
+def months_between(start, end):
+    """Number of months from `start` through `end` inclusive."""
+    return (end[0] - start[0]) * 12 + end[1] - start[1] + 1
+
+
+def month_range(start, end):
+    """(year, month) tuples from `start` through `end` inclusive."""
+    year, month = start
+    periods = []
+    while (year, month) <= tuple(end):
+        periods.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def calendar_cte(start, end):
+    """
+    SQL and params for a `calendar (period_year, period_month)` CTE from
+    `start` through `end` ((year, month) tuples). Use it as the WITH
+    clause of a raw query.
+    """
+    sql = """
+        WITH RECURSIVE calendar (period_year, period_month) AS (
+            SELECT %s, %s
+            UNION ALL
+            SELECT CASE WHEN period_month = 12 THEN period_year + 1 ELSE period_year END,
+                   CASE WHEN period_month = 12 THEN 1 ELSE period_month + 1 END
+            FROM calendar
+            WHERE period_year * 100 + period_month < %s
+        )
+    """
+    return sql, [start[0], start[1], end[0] * 100 + end[1]]
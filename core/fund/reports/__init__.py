@@ -1,3 +1,6 @@
 from . import bank_report
 from . import payment_report
+from . import gap_report
+from . import cash_report
+from . import obligation_report
 from . import get_admin_urls
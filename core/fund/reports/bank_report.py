@@ -6,6 +6,7 @@ from fund.models import Bank
 from django.http import HttpResponse
 from django.contrib import messages
 import io
+from core.years import year_index
 
 
 # Custom admin view for Bank reports
@@ -79,8 +80,7 @@ class BankReportAdminView:
             total_amount += amount
         
         # dropdowns for years
-        years_qs = Bank.objects.dates('date', 'year').distinct()
-        years = [y.year for y in years_qs]
+        years = year_index(Bank, 'date')
         
 
         context = dict(
@@ -0,0 +1,188 @@
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum, Value, F, DecimalField
+from django.db.models.functions import ExtractYear, ExtractMonth
+from django.template.response import TemplateResponse
+from decimal import Decimal
+import csv
+import datetime
+import json
+from fund.models import Bank, Payment, cash_position_cache_key, CASH_POSITION_TIMEOUT
+from django.http import HttpResponse
+from django.contrib import messages
+from core.years import year_index
+import io
+
+ZERO = Value(Decimal('0'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+# Custom admin view for the fund cash-position report
+class CashReportAdminView:
+    @staticmethod
+    def series_query():
+        """
+        Bank deposits (inflow) and paid Payments (outflow) grouped by month,
+        combined with UNION ALL. Both sides are compiled by the ORM so the
+        date extraction matches the database backend.
+        """
+        inflows = (
+            Bank.objects.order_by()
+            .annotate(period_year=ExtractYear('date'), period_month=ExtractMonth('date'))
+            .values('period_year', 'period_month')
+            .annotate(inflow=Sum('amount'), outflow=ZERO)
+        )
+        outflows = (
+            Payment.objects.filter(status='paid').order_by()
+            .annotate(period_year=F('year'), period_month=F('month'))
+            .values('period_year', 'period_month')
+            .annotate(inflow=ZERO, outflow=Sum('amount'))
+        )
+        return inflows.union(outflows, all=True).query.sql_with_params()
+
+    @staticmethod
+    def cash_position(year_param='any'):
+        """
+        Monthly inflow, outflow, net and cumulative balance, computed in one
+        query: the monthly union is summed per month and a window SUM runs
+        the balance across all history, so a single year still opens with
+        the balance carried in. Cached per filter set until a Bank or
+        Payment changes.
+        """
+        try:
+            year = int(year_param)
+        except ValueError:
+            year = None
+        key = cash_position_cache_key(year or 'any')
+        rows = cache.get(key)
+        if rows is not None:
+            return rows
+
+        union_sql, params = CashReportAdminView.series_query()
+        sql = f"""
+            SELECT period_year, period_month, inflow, outflow, balance
+            FROM (
+                SELECT period_year, period_month,
+                       SUM(inflow) AS inflow, SUM(outflow) AS outflow,
+                       SUM(SUM(inflow) - SUM(outflow)) OVER (ORDER BY period_year, period_month) AS balance
+                FROM ({union_sql}) cash
+                GROUP BY period_year, period_month
+            ) series
+            {'WHERE period_year = %s' if year else ''}
+            ORDER BY period_year, period_month
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, list(params) + ([year] if year else []))
+            records = cursor.fetchall()
+
+        rows = []
+        for period_year, period_month, inflow, outflow, balance in records:
+            inflow, outflow, balance = float(inflow or 0), float(outflow or 0), float(balance or 0)
+            rows.append({
+                'year': period_year,
+                'month': datetime.date(2000, period_month, 1).strftime('%B'),
+                'inflow': inflow,
+                'outflow': outflow,
+                'net': inflow - outflow,
+                'balance': balance,
+            })
+        cache.set(key, rows, CASH_POSITION_TIMEOUT)
+        return rows
+
+    @staticmethod
+    def totals(rows):
+        inflow = sum(r['inflow'] for r in rows)
+        outflow = sum(r['outflow'] for r in rows)
+        return {
+            'inflow': inflow,
+            'outflow': outflow,
+            'net': inflow - outflow,
+            'opening': rows[0]['balance'] - rows[0]['net'] if rows else 0.0,
+            'closing': rows[-1]['balance'] if rows else 0.0,
+        }
+
+    @staticmethod
+    def dashboard_view(request):
+        # Filters
+        year_param = request.GET.get('year', 'any')
+
+        rows = CashReportAdminView.cash_position(year_param)
+
+        # dropdown for years with either deposits or payments
+        years = sorted(set(year_index(Bank, 'date')) | set(year_index(Payment, 'payment_date')))
+
+        context = dict(
+            admin.site.each_context(request),
+            rows=rows,
+            rows_json=json.dumps(rows),
+            totals=CashReportAdminView.totals(rows),
+            years=years,
+            selected_year=str(year_param),
+        )
+        return TemplateResponse(request, "admin/bank/cash_report.html", context)
+
+    @staticmethod
+    def export_csv(request):
+        """Export the monthly cash position (filtered) as CSV."""
+        year_param = request.GET.get('year', 'any')
+        rows = CashReportAdminView.cash_position(year_param)
+
+        resp = HttpResponse(content_type='text/csv')
+        resp['Content-Disposition'] = f'attachment; filename="cash_position_{year_param}.csv"'
+        writer = csv.writer(resp)
+        writer.writerow(['Year', 'Month', 'Inflow', 'Outflow', 'Net', 'Balance'])
+        for row in rows:
+            writer.writerow([row['year'], row['month'], f"{row['inflow']:.2f}", f"{row['outflow']:.2f}",
+                             f"{row['net']:.2f}", f"{row['balance']:.2f}"])
+        return resp
+
+    @staticmethod
+    def export_pdf(request):
+        """Export the monthly cash position (filtered) as PDF."""
+        year_param = request.GET.get('year', 'any')
+        rows = CashReportAdminView.cash_position(year_param)
+        totals = CashReportAdminView.totals(rows)
+
+        try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet
+        except ImportError:
+            messages.error(request, "reportlab is required to export PDF. Install with: pip install reportlab")
+            return HttpResponse("reportlab required", status=400)
+
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter)
+        styles = getSampleStyleSheet()
+        elements = []
+        elements.append(Paragraph("Fund Cash Position", styles['Title']))
+        elements.append(Spacer(1, 12))
+
+        # add filter summary
+        filter_line = f"Year: {year_param if year_param!='any' else 'Any'}    Opening balance: {totals['opening']:.2f}"
+        elements.append(Paragraph(filter_line, styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+        data = [['Year', 'Month', 'Inflow', 'Outflow', 'Net', 'Balance']]
+        for row in rows:
+            data.append([str(row['year']), row['month'], f"{row['inflow']:.2f}", f"{row['outflow']:.2f}",
+                         f"{row['net']:.2f}", f"{row['balance']:.2f}"])
+        data.append(['', 'Totals:', f"{totals['inflow']:.2f}", f"{totals['outflow']:.2f}",
+                     f"{totals['net']:.2f}", f"{totals['closing']:.2f}"])
+
+        table = Table(data, repeatRows=1, hAlign='LEFT', colWidths=[50, 90, 90, 90, 90, 90])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f0f0')),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('ALIGN', (2,1), (-1,-1), 'RIGHT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+        ]))
+        elements.append(table)
+        doc.build(elements)
+        buffer.seek(0)
+        resp = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        resp['Content-Disposition'] = f'attachment; filename="cash_position_{year_param}.pdf"'
+        return resp
@@ -0,0 +1,189 @@
+from django.contrib import admin
+from django.db import connection
+from django.template.response import TemplateResponse
+import csv
+import datetime
+from fund.models import Needy, Payment
+from fund.periods import MAX_MONTHS, calendar_cte, month_range, months_between
+from django.http import HttpResponse
+from django.contrib import messages
+import io
+
+
+# Custom admin view for the needy payment gap report
+class GapReportAdminView:
+    @staticmethod
+    def parse_range(request):
+        """
+        (start, end) (year, month) tuples from ?start=YYYY-MM&end=YYYY-MM,
+        default the last 12 months. A longer span than MAX_MONTHS keeps its
+        end and is cut to the MAX_MONTHS months before it.
+        """
+        today = datetime.date.today()
+        end = (today.year, today.month)
+        start = (today.year - 1, today.month + 1) if today.month < 12 else (today.year, 1)
+
+        def parse(value, default):
+            try:
+                year, month = (int(part) for part in value.split('-'))
+                datetime.date(year, month, 1)
+                return (year, month)
+            except ValueError:
+                return default
+
+        start = parse(request.GET.get('start', ''), start)
+        end = parse(request.GET.get('end', ''), end)
+        if end < start:
+            start, end = end, start
+        if months_between(start, end) > MAX_MONTHS:
+            first = end[0] * 12 + end[1] - MAX_MONTHS
+            start = (first // 12, first % 12 + 1)
+        return start, end
+
+    @staticmethod
+    def gap_rows(start, end, location_param='any'):
+        """
+        Every active monthly needy with the months between start and end
+        that have no payment, or only a pending one. One query left-joins
+        payments onto the needy x month calendar and keeps the gaps; rows
+        arrive ordered by needy and are grouped here.
+        Returns (rows, totals) where totals has missing/pending counts and amount.
+        """
+        quote = connection.ops.quote_name
+        cte, params = calendar_cte(start, end)
+        location_sql = ''
+        if location_param != 'any':
+            location_sql = 'AND n.location = %s'
+            params.append(location_param)
+        sql = f"""
+            {cte}
+            SELECT n.id, n.name, n.location, n.amount, c.period_year, c.period_month, p.amount
+            FROM calendar c
+            JOIN {quote(Needy._meta.db_table)} n
+              ON n.status = 'active' AND n.category = 'monthly' {location_sql}
+            LEFT JOIN {quote(Payment._meta.db_table)} p
+              ON p.needy_id = n.id AND p.year = c.period_year AND p.month = c.period_month
+            WHERE p.id IS NULL OR p.status = 'pending'
+            ORDER BY n.name, n.id, c.period_year, c.period_month
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            records = cursor.fetchall()
+
+        location_names = dict(Needy.LOCATION_CHOICES)
+        rows = []
+        totals = {'missing': 0, 'pending': 0, 'amount': 0.0}
+        current = None
+        for needy_id, name, location, amount, year, month, payment_amount in records:
+            if current is None or current['id'] != needy_id:
+                current = {
+                    'id': needy_id,
+                    'name': name,
+                    'location': location_names.get(location, location),
+                    'missing': [],
+                    'pending': [],
+                    'amount': 0.0,
+                }
+                rows.append(current)
+            label = datetime.date(year, month, 1).strftime('%b %Y')
+            if payment_amount is None:
+                current['missing'].append(label)
+                current['amount'] += float(amount)
+                totals['missing'] += 1
+                totals['amount'] += float(amount)
+            else:
+                current['pending'].append(label)
+                current['amount'] += float(payment_amount)
+                totals['pending'] += 1
+                totals['amount'] += float(payment_amount)
+        return rows, totals
+
+    @staticmethod
+    def _report(request):
+        start, end = GapReportAdminView.parse_range(request)
+        location_param = request.GET.get('location', 'any')
+        rows, totals = GapReportAdminView.gap_rows(start, end, location_param)
+        return start, end, location_param, rows, totals
+
+    @staticmethod
+    def dashboard_view(request):
+        start, end, location_param, rows, totals = GapReportAdminView._report(request)
+
+        context = dict(
+            admin.site.each_context(request),
+            rows=rows,
+            totals=totals,
+            month_count=len(month_range(start, end)),
+            start=f"{start[0]:04d}-{start[1]:02d}",
+            end=f"{end[0]:04d}-{end[1]:02d}",
+            locations=Needy.LOCATION_CHOICES,
+            selected_location=location_param,
+        )
+        return TemplateResponse(request, "admin/payment/gap_report.html", context)
+
+    @staticmethod
+    def export_csv(request):
+        """Export the gaps (filtered) as CSV, one row per needy and month."""
+        start, end, location_param, rows, totals = GapReportAdminView._report(request)
+
+        resp = HttpResponse(content_type='text/csv')
+        resp['Content-Disposition'] = f'attachment; filename="payment_gaps_{start[0]}-{start[1]:02d}_{end[0]}-{end[1]:02d}.csv"'
+        writer = csv.writer(resp)
+        writer.writerow(['Needy', 'Location', 'Month', 'Gap'])
+        for row in rows:
+            for label in row['missing']:
+                writer.writerow([row['name'], row['location'], label, 'Missing'])
+            for label in row['pending']:
+                writer.writerow([row['name'], row['location'], label, 'Pending'])
+        return resp
+
+    @staticmethod
+    def export_pdf(request):
+        """Export the gaps (filtered) as PDF, one row per needy."""
+        start, end, location_param, rows, totals = GapReportAdminView._report(request)
+
+        try:
+            from reportlab.lib.pagesizes import letter, landscape
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet
+        except ImportError:
+            messages.error(request, "reportlab is required to export PDF. Install with: pip install reportlab")
+            return HttpResponse("reportlab required", status=400)
+
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
+        styles = getSampleStyleSheet()
+        elements = []
+        elements.append(Paragraph("Payment Gaps", styles['Title']))
+        elements.append(Spacer(1, 12))
+
+        # add filter summary
+        filter_line = f"Months: {start[0]}-{start[1]:02d} - {end[0]}-{end[1]:02d}"
+        if location_param != 'any':
+            filter_line += f"    Location: {dict(Needy.LOCATION_CHOICES).get(location_param, location_param)}"
+        elements.append(Paragraph(filter_line, styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+        cell = styles['BodyText']
+        data = [['Needy', 'Location', 'Missing', 'Pending', 'Amount']]
+        for row in rows:
+            data.append([row['name'], row['location'], Paragraph(', '.join(row['missing']), cell),
+                         Paragraph(', '.join(row['pending']), cell), f"{row['amount']:.2f}"])
+        data.append(['', 'Totals:', str(totals['missing']), str(totals['pending']), f"{totals['amount']:.2f}"])
+
+        table = Table(data, repeatRows=1, hAlign='LEFT', colWidths=[130, 70, 230, 200, 70])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f0f0')),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('ALIGN', (4,1), (-1,-1), 'RIGHT'),
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+        ]))
+        elements.append(table)
+        doc.build(elements)
+        buffer.seek(0)
+        resp = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        resp['Content-Disposition'] = f'attachment; filename="payment_gaps_{start[0]}-{start[1]:02d}_{end[0]}-{end[1]:02d}.pdf"'
+        return resp
@@ -2,6 +2,9 @@ from django.urls import path
 from django.contrib import admin
 from fund.reports.bank_report import BankReportAdminView
 from fund.reports.payment_report import PaymentReportAdminView
+from fund.reports.gap_report import GapReportAdminView
+from fund.reports.cash_report import CashReportAdminView
+from fund.reports.obligation_report import ObligationReportAdminView
 
 def get_admin_urls(original_get_urls):
     def get_urls():
@@ -10,6 +13,15 @@ def get_admin_urls(original_get_urls):
             path('report/bank/export_pdf/', admin.site.admin_view(BankReportAdminView.export_pdf), name='bank_report_export_pdf'),
             path('report/payment/', admin.site.admin_view(PaymentReportAdminView.dashboard_view), name='payment_report'),
             path('report/payment/export_pdf/', admin.site.admin_view(PaymentReportAdminView.export_pdf), name='payment_report_export_pdf'),
+            path('report/payment_gaps/', admin.site.admin_view(GapReportAdminView.dashboard_view), name='payment_gap_report'),
+            path('report/payment_gaps/export_pdf/', admin.site.admin_view(GapReportAdminView.export_pdf), name='payment_gap_report_export_pdf'),
+            path('report/payment_gaps/export_csv/', admin.site.admin_view(GapReportAdminView.export_csv), name='payment_gap_report_export_csv'),
+            path('report/cash_position/', admin.site.admin_view(CashReportAdminView.dashboard_view), name='cash_position_report'),
+            path('report/cash_position/export_pdf/', admin.site.admin_view(CashReportAdminView.export_pdf), name='cash_position_report_export_pdf'),
+            path('report/cash_position/export_csv/', admin.site.admin_view(CashReportAdminView.export_csv), name='cash_position_report_export_csv'),
+            path('report/obligations/', admin.site.admin_view(ObligationReportAdminView.dashboard_view), name='obligation_report'),
+            path('report/obligations/export_pdf/', admin.site.admin_view(ObligationReportAdminView.export_pdf), name='obligation_report_export_pdf'),
+            path('report/obligations/export_csv/', admin.site.admin_view(ObligationReportAdminView.export_csv), name='obligation_report_export_csv'),
         ]
         return my_urls + original_get_urls()
     return get_urls
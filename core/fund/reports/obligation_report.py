@@ -0,0 +1,143 @@
+from django.contrib import admin
+from django.template.response import TemplateResponse
+import csv
+import json
+from fund.models import Needy
+from fund.forecast import forecast, forecast_rows
+from django.http import HttpResponse
+from django.contrib import messages
+import io
+
+HORIZONS = [12, 24]
+TRAILING_WINDOWS = [3, 6, 12, 24]
+
+
+# Custom admin view for the fund obligation forecast
+class ObligationReportAdminView:
+    @staticmethod
+    def filters(request):
+        def choice(name, options, default):
+            try:
+                value = int(request.GET.get(name, default))
+            except ValueError:
+                value = default
+            return value if value in options else default
+
+        months = choice('months', HORIZONS, 12)
+        trailing = choice('trailing', TRAILING_WINDOWS, 12)
+        location_param = request.GET.get('location', 'any')
+        return months, trailing, location_param
+
+    @staticmethod
+    def _forecast(request):
+        months, trailing, location_param = ObligationReportAdminView.filters(request)
+        result = forecast(months, trailing, location=None if location_param == 'any' else location_param)
+        return months, trailing, location_param, result
+
+    @staticmethod
+    def totals(rows):
+        return {
+            key: round(sum(r[key] for r in rows), 2)
+            for key in ('monthly', 'annual', 'obligations', 'inflow', 'shortfall')
+        }
+
+    @staticmethod
+    def dashboard_view(request):
+        try:
+            months, trailing, location_param, result = ObligationReportAdminView._forecast(request)
+        except ImportError:
+            messages.error(request, "numpy is required for the obligation forecast. Install with: pip install numpy")
+            return HttpResponse("numpy required", status=400)
+
+        rows = forecast_rows(result)
+        context = dict(
+            admin.site.each_context(request),
+            rows=rows,
+            rows_json=json.dumps(rows),
+            totals=ObligationReportAdminView.totals(rows),
+            trailing_average=result['trailing_average'],
+            needy_count=result['needy_count'],
+            short_months=sum(1 for r in rows if r['shortfall'] > 0),
+            horizons=HORIZONS,
+            trailing_windows=TRAILING_WINDOWS,
+            locations=Needy.LOCATION_CHOICES,
+            selected_months=months,
+            selected_trailing=trailing,
+            selected_location=location_param,
+        )
+        return TemplateResponse(request, "admin/needy/obligation_report.html", context)
+
+    @staticmethod
+    def export_csv(request):
+        """Export the monthly obligation forecast as CSV."""
+        try:
+            months, trailing, location_param, result = ObligationReportAdminView._forecast(request)
+        except ImportError:
+            messages.error(request, "numpy is required for the obligation forecast. Install with: pip install numpy")
+            return HttpResponse("numpy required", status=400)
+
+        resp = HttpResponse(content_type='text/csv')
+        resp['Content-Disposition'] = f'attachment; filename="obligation_forecast_{months}m.csv"'
+        writer = csv.writer(resp)
+        writer.writerow(['Month', 'Monthly', 'Annual', 'Obligations', f'Inflow ({trailing}m avg)', 'Shortfall', 'Cumulative'])
+        for row in forecast_rows(result):
+            writer.writerow([row['period']] + [f"{row[key]:.2f}" for key in
+                            ('monthly', 'annual', 'obligations', 'inflow', 'shortfall', 'cumulative')])
+        return resp
+
+    @staticmethod
+    def export_pdf(request):
+        """Export the monthly obligation forecast as PDF."""
+        try:
+            months, trailing, location_param, result = ObligationReportAdminView._forecast(request)
+        except ImportError:
+            messages.error(request, "numpy is required for the obligation forecast. Install with: pip install numpy")
+            return HttpResponse("numpy required", status=400)
+        rows = forecast_rows(result)
+        totals = ObligationReportAdminView.totals(rows)
+
+        try:
+            from reportlab.lib.pagesizes import letter, landscape
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet
+        except ImportError:
+            messages.error(request, "reportlab is required to export PDF. Install with: pip install reportlab")
+            return HttpResponse("reportlab required", status=400)
+
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
+        styles = getSampleStyleSheet()
+        elements = []
+        elements.append(Paragraph("Obligation Forecast", styles['Title']))
+        elements.append(Spacer(1, 12))
+
+        # add filter summary
+        filter_line = f"Months: {months}    Inflow: {trailing}-month average {result['trailing_average']:.2f}"
+        if location_param != 'any':
+            filter_line += f"    Location: {dict(Needy.LOCATION_CHOICES).get(location_param, location_param)}"
+        elements.append(Paragraph(filter_line, styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+        data = [['Month', 'Monthly', 'Annual', 'Obligations', 'Inflow', 'Shortfall', 'Cumulative']]
+        for row in rows:
+            data.append([row['period']] + [f"{row[key]:.2f}" for key in
+                        ('monthly', 'annual', 'obligations', 'inflow', 'shortfall', 'cumulative')])
+        data.append(['Totals:'] + [f"{totals[key]:.2f}" for key in
+                    ('monthly', 'annual', 'obligations', 'inflow', 'shortfall')] + [''])
+
+        table = Table(data, repeatRows=1, hAlign='LEFT', colWidths=[70, 90, 90, 90, 90, 90, 90])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f0f0')),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('ALIGN', (1,1), (-1,-1), 'RIGHT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+        ]))
+        elements.append(table)
+        doc.build(elements)
+        buffer.seek(0)
+        resp = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        resp['Content-Disposition'] = f'attachment; filename="obligation_forecast_{months}m.pdf"'
+        return resp
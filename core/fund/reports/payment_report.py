@@ -6,6 +6,7 @@ from fund.models import Payment
 from django.http import HttpResponse
 from django.contrib import messages
 import io
+from core.years import year_index
 
 # Custom admin view for Payment reports
 class PaymentReportAdminView:
@@ -104,8 +105,7 @@ class PaymentReportAdminView:
                 selected_needy_name = "Unknown"
 
         # dropdowns for years
-        years_qs = Payment.objects.dates('payment_date', 'year').distinct()
-        years = [y.year for y in years_qs]
+        years = year_index(Payment, 'payment_date')
 
         context = dict(
             admin.site.each_context(request),
@@ -1,3 +1,151 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from fund.forecast import forecast
+from fund.models import Bank, Needy, Payment
+from fund.reports.cash_report import CashReportAdminView
+from fund.reports.gap_report import GapReportAdminView
+
+
+def make_needy(name, amount=Decimal('100'), category='monthly', **kwargs):
+    return Needy.objects.create(name=name, amount=amount, category=category, **kwargs)
+
+
+class GeneratePaymentsTests(TestCase):
+    def setUp(self):
+        self.monthly = make_needy('Monthly')
+        self.annual = make_needy('Annual', amount=Decimal('1200'), category='annually')
+        make_needy('By need', category='byneed')
+        make_needy('Inactive', status='inactive')
+
+    def test_generate_range_creates_only_missing_payments(self):
+        Payment.objects.create(needy=self.monthly, amount=Decimal('100'), payment_date=datetime.date(2025, 2, 15))
+
+        created = Payment.generate_range((2025, 1), (2025, 3))
+
+        # monthly: January and March; annual: once, in the first month
+        self.assertEqual(created, 3)
+        self.assertEqual(Payment.objects.filter(status='pending').count(), 3)
+        self.assertEqual(Payment.generate_range((2025, 1), (2025, 3)), 0)
+
+    def test_conflicting_rows_are_not_counted(self):
+        rows = [
+            (self.monthly.pk, Decimal('100'), datetime.date(2025, 5, 1)),
+            (self.annual.pk, Decimal('1200'), datetime.date(2025, 5, 1)),
+        ]
+        # written by a concurrent run after the missing rows were read
+        Payment.objects.create(needy=self.monthly, amount=Decimal('100'), payment_date=datetime.date(2025, 5, 1))
+
+        self.assertEqual(Payment._insert_pending(rows), 1)
+        self.assertEqual(Payment.objects.filter(year=2025, month=5).count(), 2)
+
+
+class GenerateRangeTests(TestCase):
+    def setUp(self):
+        self.monthly = make_needy('Monthly')
+        self.annual = make_needy('Annual', amount=Decimal('1200'), category='annually')
+        self.paid = make_needy('Paid annual', amount=Decimal('600'), category='annually')
+        make_needy('By need', category='byneed')
+        make_needy('Inactive', status='inactive')
+        Payment.objects.create(needy=self.monthly, amount=Decimal('100'), payment_date=datetime.date(2024, 12, 20))
+        # any payment in 2025 covers that year's annual one
+        Payment.objects.create(needy=self.paid, amount=Decimal('600'), payment_date=datetime.date(2025, 6, 1))
+
+    def pending(self):
+        return list(Payment.objects.filter(status='pending').order_by('payment_date', 'needy__name')
+                    .values_list('needy__name', 'payment_date'))
+
+    def test_range_across_a_year_end_by_category(self):
+        start, end = (2024, 11), (2025, 2)
+        self.assertEqual([row[:4] for row in Payment.missing_summary(start, end)], [
+            (2024, 11, 'annually', 2), (2024, 11, 'monthly', 1),
+            (2025, 1, 'annually', 1), (2025, 1, 'monthly', 1),
+            (2025, 2, 'monthly', 1),
+        ])
+
+        self.assertEqual(Payment.generate_range(start, end, categories=('annually',)), 3)
+        self.assertEqual(Payment.generate_range(start, end), 3)
+
+        self.assertEqual(self.pending(), [
+            ('Annual', datetime.date(2024, 11, 1)), ('Monthly', datetime.date(2024, 11, 1)),
+            ('Paid annual', datetime.date(2024, 11, 1)),
+            ('Annual', datetime.date(2025, 1, 1)), ('Monthly', datetime.date(2025, 1, 1)),
+            ('Monthly', datetime.date(2025, 2, 1)),
+        ])
+        self.assertEqual(Payment.generate_range(start, end), 0)
+        self.assertEqual(Payment.missing_summary(start, end), [])
+
+
+class GapReportTests(TestCase):
+    def test_range_is_clamped_to_max_months(self):
+        request = RequestFactory().get('/', {'start': '1900-01', 'end': '2025-12'})
+
+        self.assertEqual(GapReportAdminView.parse_range(request), ((2016, 1), (2025, 12)))
+
+    def test_gaps_list_missing_and_pending_months(self):
+        needy = make_needy('Monthly', location='relative')
+        make_needy('Elsewhere')
+        Payment.objects.create(needy=needy, amount=Decimal('100'), payment_date=datetime.date(2025, 1, 5))
+        Payment.objects.create(needy=needy, amount=Decimal('80'), payment_date=datetime.date(2025, 2, 1), status='pending')
+
+        rows, totals = GapReportAdminView.gap_rows((2025, 1), (2025, 3), 'relative')
+
+        self.assertEqual([(row['name'], row['missing'], row['pending']) for row in rows], [('Monthly', ['Mar 2025'], ['Feb 2025'])])
+        self.assertEqual(totals, {'missing': 1, 'pending': 1, 'amount': 180.0})
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        make_needy('Monthly', amount=Decimal('100'))
+        self.paid = make_needy('Paid annual', amount=Decimal('1200'), category='annually')
+        make_needy('Unpaid annual', amount=Decimal('600'), category='annually')
+        Payment.objects.create(needy=self.paid, amount=Decimal('1200'), payment_date=datetime.date(2025, 3, 1))
+        Bank.objects.create(amount=Decimal('2400'), date=datetime.date(2024, 6, 10))
+
+    def test_paid_annual_is_not_due_again_in_the_start_year(self):
+        result = forecast(months=3, trailing=12, start=(2025, 1))
+
+        self.assertEqual(list(result['annual']), [600.0, 0.0, 0.0])
+        self.assertEqual(list(result['obligations']), [700.0, 100.0, 100.0])
+        self.assertEqual(result['trailing_average'], 200.0)
+        self.assertEqual(list(result['shortfall']), [500.0, -100.0, -100.0])
+
+    def test_annual_needies_are_due_next_january(self):
+        result = forecast(months=8, trailing=12, start=(2025, 6))
+
+        # the unpaid one catches up in the first month; both are due in January
+        self.assertEqual(list(result['annual']), [600.0] + [0.0] * 6 + [1800.0])
+        self.assertEqual(result['periods'][7], (2026, 1))
+
+
+class CashPositionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        needy = make_needy('Monthly')
+        Bank.objects.create(amount=Decimal('1000'), date=datetime.date(2024, 12, 5))
+        Bank.objects.create(amount=Decimal('500'), date=datetime.date(2025, 2, 5))
+        Payment.objects.create(needy=needy, amount=Decimal('300'), payment_date=datetime.date(2025, 1, 10))
+        Payment.objects.create(needy=needy, amount=Decimal('300'), payment_date=datetime.date(2025, 2, 10))
+        # pending payments are not cash out yet
+        Payment.objects.create(needy=needy, amount=Decimal('300'), payment_date=datetime.date(2025, 3, 1), status='pending')
+
+    def test_year_opens_with_the_balance_carried_in(self):
+        rows = CashReportAdminView.cash_position('2025')
+
+        self.assertEqual(
+            [(row['month'], row['inflow'], row['outflow'], row['balance']) for row in rows],
+            [('January', 0.0, 300.0, 700.0), ('February', 500.0, 300.0, 900.0)],
+        )
+        self.assertEqual(CashReportAdminView.totals(rows), {
+            'inflow': 500.0, 'outflow': 600.0, 'net': -100.0, 'opening': 1000.0, 'closing': 900.0,
+        })
+
+    def test_new_deposit_drops_the_cached_series(self):
+        self.assertEqual(CashReportAdminView.cash_position()[-1]['balance'], 900.0)
+
+        Bank.objects.create(amount=Decimal('100'), date=datetime.date(2025, 2, 20))
+
+        self.assertEqual(CashReportAdminView.cash_position()[-1]['balance'], 1000.0)
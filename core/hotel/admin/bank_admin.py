@@ -1,7 +1,10 @@
 from django.contrib import admin
-from django.db.models import Sum
+from django.core.exceptions import ValidationError
+from django.db.models import Sum, Value
 from decimal import Decimal
-from hotel.models import Bank
+from hotel.models import Bank, ShopRent, Expense, period_q, next_period, current_year, current_month
+import calendar
+from core.years import YearIndexListFilter
 
 
 class MonthNameListFilter(admin.SimpleListFilter):
@@ -19,136 +22,169 @@ class MonthNameListFilter(admin.SimpleListFilter):
         return queryset
 
 
-class YearListFilter(admin.SimpleListFilter):
-    title = 'Year'
-    parameter_name = 'year'
-    template = 'admin/select_filter.html'  # Use select box
+class YearListFilter(YearIndexListFilter):
+    year_model = Bank
 
-    def lookups(self, request, model_admin):
-        years = Bank.objects.values_list('year', flat=True).distinct().order_by('-year')
-        return [(y, str(y)) for y in years if y]
 
-    def queryset(self, request, queryset):
-        if self.value():
-            return queryset.filter(year=int(self.value()))
-        return queryset
+class PeriodClose:
+    """
+    Computed figures for one bank close: totals for its (year, month) window
+    and the balance carried over from the previous close. Built once per
+    request (add page) or per bank row (change page) and shared by every
+    display/save hook.
+    """
+
+    def __init__(self, previous, start, end, total, expense):
+        self.previous = previous
+        self.start = start
+        self.end = end
+        self.total = total
+        self.expense = expense
+        self.prev_balance = Decimal(str(previous.balance)) if previous and previous.balance is not None else Decimal('0')
+
+    @property
+    def final(self):
+        return self.total + self.prev_balance - self.expense
 
 
 @admin.register(Bank)
 class BankAdmin(admin.ModelAdmin):
-    list_display = ('year', 'month', 'total', 'expense', 'distribute', 'balance', 'created_at')
+    list_display = ('year', 'month', 'period', 'total', 'expense', 'distribute', 'balance', 'created_at')
     list_filter = (MonthNameListFilter, YearListFilter)
 
     # Show labels (readonly callables) for computed values, and editable distribute.
     # Order: total (label), expense (label), balance (label), final (label), distribute (editable)
-    fields = ('display_total', 'display_expense', 'display_balance', 'display_final', 'distribute')
-    readonly_fields = ('display_total', 'display_expense', 'display_balance', 'display_final')
+    fields = ('display_period', 'display_total', 'display_expense', 'display_balance', 'display_final', 'distribute')
+    readonly_fields = ('display_period', 'display_total', 'display_expense', 'display_balance', 'display_final')
 
     # --- helpers ---------------------------------------------------------
-    def _get_bank_cutoff_date(self, last_bank):
-        if not last_bank:
-            return None
-        for name in ('created_at', 'rent_date', 'date', 'paid_at', 'transaction_date'):
-            if hasattr(last_bank, name):
-                return getattr(last_bank, name)
-        return None
-
-    def _date_field_for_model(self, model_cls):
-        candidates = ('created_at', 'rent_date', 'date', 'paid_at', 'transaction_date')
-        for f in model_cls._meta.fields:
-            if getattr(f, 'name', None) in candidates:
-                return f.name
-        return None
-
-    def _sum_qs(self, qs, *fields):
-        for f in fields:
-            agg = qs.aggregate(s=Sum(f))
-            val = agg.get('s')
-            if val is not None:
-                # ensure Decimal
-                return Decimal(str(val))
-        return Decimal('0')
-
-    def _compute_totals_and_prev_balance(self, last_bank):
+    def _period_totals(self, start, end):
         """
-        Returns (total, expense, prev_balance) where:
-         - total = sum ShopRent.final_amount or ShopRent.amount for records after cutoff (if cutoff available)
-         - expense = sum Expense.amount for records after cutoff (if cutoff available)
-         - prev_balance = last_bank.balance or 0
+        Sum ShopRent.amount and Expense.amount inside the (year, month) window
+        in one round trip: a UNION of the two aggregates, each a range scan
+        on the (year, month) index. Returns (total, expense).
         """
-        try:
-            from hotel.models import ShopRent, Expense
-        except Exception:
-            ShopRent = None
-            Expense = None
-
-        cutoff = self._get_bank_cutoff_date(last_bank)
-
-        total = Decimal('0')
-        if ShopRent is not None:
-            date_field = self._date_field_for_model(ShopRent)
-            if cutoff and date_field:
-                qs = ShopRent.objects.filter(**{f"{date_field}__gt": cutoff})
-            else:
-                qs = ShopRent.objects.all()
-            total = self._sum_qs(qs,  'amount')
-
-        expense = Decimal('0')
-        if Expense is not None:
-            date_field = self._date_field_for_model(Expense)
-            if cutoff and date_field:
-                qs = Expense.objects.filter(**{f"{date_field}__gt": cutoff})
-            else:
-                qs = Expense.objects.all()
-            expense = self._sum_qs(qs, 'amount')
-
-        prev_balance = Decimal(str(last_bank.balance)) if last_bank and getattr(last_bank, 'balance', None) is not None else Decimal('0')
-        return total, expense, prev_balance
+        window = period_q(start, end)
+        rents = ShopRent.objects.order_by().filter(window)
+        expenses = Expense.objects.order_by().filter(window)
+        rows = dict(
+            rents.annotate(kind=Value('total')).values('kind').annotate(s=Sum('amount')).values_list('kind', 's')
+            .union(expenses.annotate(kind=Value('expense')).values('kind').annotate(s=Sum('amount')).values_list('kind', 's'), all=True)
+        )
+        return (
+            Decimal(str(rows.get('total') or 0)),
+            Decimal(str(rows.get('expense') or 0)),
+        )
+
+    @staticmethod
+    def _first_period(end):
+        """The oldest rent/expense (year, month), as backfill_bank_periods uses; `end` when there are none."""
+        firsts = [
+            qs.order_by('year', 'month').values_list('year', 'month').first()
+            for qs in (ShopRent.objects, Expense.objects)
+        ]
+        return min([p for p in firsts if p] + [end])
+
+    def _build_snapshot(self, previous, end, start=None):
+        # a new window starts the month after the previous close ended; the
+        # first close starts at the earliest transaction
+        if start is None:
+            start = next_period(previous.year, previous.month) if previous is not None else self._first_period(end)
+        total, expense = self._period_totals(start, end)
+        return PeriodClose(previous, start, end, total, expense)
+
+    def get_close_snapshot(self, request=None, obj=None):
+        """
+        Return the PeriodClose for a bank row being edited (cached on the row)
+        or for a new close of the current month (cached on the request).
+        """
+        if obj is not None and obj.pk:
+            snapshot = getattr(obj, '_close_snapshot', None)
+            if snapshot is None:
+                previous = Bank.objects.filter(created_at__lt=obj.created_at).order_by('-created_at').first()
+                snapshot = obj._close_snapshot = self._build_snapshot(previous, obj.period_end, obj.period_start)
+            return snapshot
+        snapshot = getattr(request, '_bank_close_snapshot', None) if request is not None else None
+        if snapshot is None:
+            previous = Bank.objects.order_by('-created_at').first()
+            snapshot = self._build_snapshot(previous, (current_year(), current_month()))
+            if request is not None:
+                request._bank_close_snapshot = snapshot
+        return snapshot
+
+    def _snapshot_for(self, obj):
+        # render_change_form attaches the request's snapshot to the form instance
+        snapshot = getattr(obj, '_close_snapshot', None)
+        return snapshot if snapshot is not None else self.get_close_snapshot(obj=obj)
+
+    def render_change_form(self, request, context, add=False, change=False, form_url='', obj=None):
+        adminform = context.get('adminform')
+        if adminform is not None:
+            adminform.form.instance._close_snapshot = self.get_close_snapshot(request, obj)
+        return super().render_change_form(request, context, add=add, change=change, form_url=form_url, obj=obj)
+
+    @staticmethod
+    def _format_window(start, end):
+        label = lambda p: f"{calendar.month_abbr[p[1]]} {p[0]}"
+        if start is None:
+            return f"... - {label(end)}"
+        if start > end:
+            return f"{label(end)} (already closed)"
+        return label(end) if start == end else f"{label(start)} - {label(end)}"
+
+    def period(self, obj):
+        return self._format_window(obj.period_start, obj.period_end)
+    period.short_description = 'Period'
+
+    def display_period(self, obj):
+        snapshot = self._snapshot_for(obj)
+        return self._format_window(snapshot.start, snapshot.end)
+    display_period.short_description = 'Period (auto)'
 
     # --- display callables used as readonly_fields -----------------------
     def display_total(self, obj):
-        last_bank = Bank.objects.order_by('-created_at').first()
-        total, _, _ = self._compute_totals_and_prev_balance(last_bank)
-        return f"{total:.2f}"
+        return f"{self._snapshot_for(obj).total:.2f}"
     display_total.short_description = 'Total (auto)'
 
     def display_expense(self, obj):
-        last_bank = Bank.objects.order_by('-created_at').first()
-        _, expense, _ = self._compute_totals_and_prev_balance(last_bank)
-        return f"{expense:.2f}"
+        return f"{self._snapshot_for(obj).expense:.2f}"
     display_expense.short_description = 'Expense (auto)'
 
     def display_balance(self, obj):
         # show previous bank balance (if adding) or the instance's balance (if editing)
-        if obj and getattr(obj, 'balance', None) is not None:
+        if obj and obj.pk and getattr(obj, 'balance', None) is not None:
             try:
                 return f"{Decimal(str(obj.balance)):.2f}"
             except Exception:
                 return str(obj.balance)
-        last_bank = Bank.objects.order_by('-created_at').first()
-        _, _, prev_balance = self._compute_totals_and_prev_balance(last_bank)
-        return f"{prev_balance:.2f}"
+        return f"{self._snapshot_for(obj).prev_balance:.2f}"
     display_balance.short_description = 'Balance (auto)'
 
     def display_final(self, obj):
-        # prefer model value if editing and present
-        if obj and getattr(obj, 'final', None) not in (None, ''):
-            try:
-                return f"{Decimal(str(obj.final)):.2f}"
-            except Exception:
-                return str(obj.final)
-        last_bank = Bank.objects.order_by('-created_at').first()
-        total, expense, prev_balance = self._compute_totals_and_prev_balance(last_bank)
-        final_val = total + prev_balance - expense
-        return f"{final_val:.2f}"
+        return f"{self._snapshot_for(obj).final:.2f}"
     display_final.short_description = 'Final (auto)'
 
     # --- form initial / save hooks --------------------------------------
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        if obj is not None:
+            return form
+        snapshot = self.get_close_snapshot(request)
+
+        class CloseForm(form):
+            def clean(self):
+                cleaned = super().clean()
+                # the previous close already covers the current month
+                if snapshot.start > snapshot.end:
+                    year, month = snapshot.end
+                    raise ValidationError(f'{calendar.month_name[month]} {year} is already closed; there is nothing new to close.')
+                return cleaned
+
+        return CloseForm
+
     def get_changeform_initial_data(self, request):
         initial = super().get_changeform_initial_data(request) or {}
-        last_bank = Bank.objects.order_by('-created_at').first()
-        total, expense, prev_balance = self._compute_totals_and_prev_balance(last_bank)
-        final = total + prev_balance - expense
+        snapshot = self.get_close_snapshot(request)
 
         # set distribute default; actual numeric fields are written in save_model
         initial.update({
@@ -156,35 +192,22 @@ class BankAdmin(admin.ModelAdmin):
         })
         # still provide numeric values for the model fields (not shown) so form.cleaned_data may contain them
         initial.update({
-            'total': total,
-            'expense': expense,
-            'balance': prev_balance,
-            'final': final,
+            'total': snapshot.total,
+            'expense': snapshot.expense,
+            'balance': snapshot.prev_balance,
+            'final': snapshot.final,
         })
         return initial
 
     def save_model(self, request, obj, form, change):
-        # compute totals from last bank and override/store to model fields automatically
-        last_bank = Bank.objects.order_by('-created_at').first()
-        total, expense, _ = self._compute_totals_and_prev_balance(last_bank)
-
-        # set computed totals if not provided or to ensure server-side correctness
-        try:
-            obj.total = total
-            obj.expense = expense
-        except Exception:
-            pass
-
-        # compute final if not provided
-        prev_balance = Decimal(str(last_bank.balance)) if last_bank and getattr(last_bank, 'balance', None) is not None else Decimal('0')
-        if getattr(obj, 'final', None) in (None, ''):
-            obj.final = total + prev_balance - expense
-        else:
-            # ensure Decimal
-            obj.final = Decimal(str(obj.final))
+        # store the server-side computed totals and window on the model fields
+        snapshot = self.get_close_snapshot(request, obj if change else None)
+        obj.start_year, obj.start_month = snapshot.start
+        obj.total = snapshot.total
+        obj.expense = snapshot.expense
 
         # compute balance as final - distribute (as requested)
         distribute = Decimal(getattr(obj, 'distribute', 0) or 0)
-        obj.balance = (obj.final - distribute)
+        obj.balance = (snapshot.final - distribute)
 
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from hotel.models import Expense
+from core.years import YearIndexListFilter
 
 class MonthNameListFilter(admin.SimpleListFilter):
     title = 'Month'
@@ -15,19 +16,8 @@ class MonthNameListFilter(admin.SimpleListFilter):
             return queryset.filter(month=int(self.value()))
         return queryset
 
-class YearListFilter(admin.SimpleListFilter):
-    title = 'Year'
-    parameter_name = 'year'
-    template = 'admin/select_filter.html'  # Use select box
-
-    def lookups(self, request, model_admin):
-        years = Expense.objects.values_list('year', flat=True).distinct().order_by('-year')
-        return [(year, year) for year in years if year]
-
-    def queryset(self, request, queryset):
-        if self.value():
-            return queryset.filter(year=int(self.value()))
-        return queryset
+class YearListFilter(YearIndexListFilter):
+    year_model = Expense
 
 
 @admin.register(Expense)
@@ -1,6 +1,14 @@
-from django.contrib import admin
-from hotel.models import ShopRent, ShopPayment
-from django.db.models import Sum
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from hotel.models import Shop, ShopRent, ShopPayment, refresh_derived_totals
+from django.db import transaction
+from django.db.models import Sum, Count
+from django import forms
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from datetime import date
+from core.years import YearIndexListFilter
 
 class MonthNameListFilter(admin.SimpleListFilter):
     title = 'Month'
@@ -16,42 +24,73 @@ class MonthNameListFilter(admin.SimpleListFilter):
             return queryset.filter(month=int(self.value()))
         return queryset
 
-class PaymentYearListFilter(admin.SimpleListFilter):
-    title = 'Year'
-    parameter_name = 'year'
-    template = 'admin/select_filter.html'  # Use select box
+class PaymentYearListFilter(YearIndexListFilter):
+    year_model = ShopPayment
 
-    def lookups(self, request, model_admin):
-        years = ShopPayment.objects.values_list('year', flat=True).distinct().order_by('-year')
-        return [(year, year) for year in years if year]
-
-    def queryset(self, request, queryset):
-        if self.value():
-            return queryset.filter(year=int(self.value()))
-        return queryset
-
-class RentYearListFilter(admin.SimpleListFilter):
-    title = 'Year'
-    parameter_name = 'year'
-    template = 'admin/select_filter.html'  # Use select box
-
-    def lookups(self, request, model_admin):
-        years = ShopRent.objects.values_list('year', flat=True).distinct().order_by('-year')
-        return [(year, year) for year in years if year]
-
-    def queryset(self, request, queryset):
-        if self.value():
-            return queryset.filter(year=int(self.value()))
-        return queryset
+class RentYearListFilter(YearIndexListFilter):
+    year_model = ShopRent
 
 @admin.register(ShopRent)
 class ShopRentAdmin(admin.ModelAdmin):
-    list_display = ('shop', 'rent_date', 'amount', 'discount',  'final_amount','is_percentage',)
-    list_filter = (MonthNameListFilter, RentYearListFilter)
+    list_display = ('shop', 'rent_date', 'amount', 'discount',  'final_amount','is_percentage', 'paid_amount', 'is_settled')
+    list_filter = (MonthNameListFilter, RentYearListFilter, 'is_settled')
     search_fields = ('shop__shop_no',)
     ordering = ('-rent_date',)
     fields = ('shop', 'amount',  'discount', 'is_percentage',  'rent_date')
     change_list_template = 'admin/hotel/shoprent/change_list.html'
+    actions = ['apply_discount']
+
+    class DiscountForm(forms.Form):
+        discount = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+        is_percentage = forms.BooleanField(required=False, label='Discount is a percentage')
+
+        def clean(self):
+            cleaned = super().clean()
+            discount = cleaned.get('discount')
+            if cleaned.get('is_percentage') and discount is not None and discount > 100:
+                self.add_error('discount', 'A percentage discount must not exceed 100.')
+            return cleaned
+
+    def apply_discount(self, request, queryset):
+        selected = request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME)
+        return redirect(reverse('admin:hotel_shoprent_apply_discount') + '?ids=' + ','.join(selected))
+    apply_discount.short_description = "Apply a discount to selected rents"
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path('apply-discount/', self.admin_site.admin_view(self.apply_discount_view), name='hotel_shoprent_apply_discount'),
+        ]
+        return custom + urls
+
+    def apply_discount_view(self, request):
+        ids = [i for i in request.GET.get('ids', '').split(',') if i]
+        if not ids:
+            messages.error(request, 'No rents selected.')
+            return redirect('admin:hotel_shoprent_changelist')
+        rents = ShopRent.objects.filter(id__in=ids)
+        if request.method == 'POST':
+            form = self.DiscountForm(request.POST)
+            if form.is_valid():
+                # one UPDATE; final_amount is regenerated by the database and the
+                # balance/rollup/allocation tables are refreshed once for the batch
+                try:
+                    count, _ = ShopRent.apply_discount(rents, form.cleaned_data['discount'], form.cleaned_data['is_percentage'])
+                except ValidationError as e:
+                    form.add_error('discount', e)
+                else:
+                    messages.success(request, f'Discount applied to {count} rents ({len(ids) - count} already had it).')
+                    return redirect('admin:hotel_shoprent_changelist')
+        else:
+            form = self.DiscountForm()
+        totals = rents.aggregate(count=Count('id'), amount=Sum('amount'), final=Sum('final_amount'))
+        context = dict(
+            self.admin_site.each_context(request),
+            form=form,
+            totals=totals,
+            title='Apply discount',
+        )
+        return TemplateResponse(request, 'admin/hotel/shoprent/apply_discount.html', context)
 
     def changelist_view(self, request, extra_context=None):
         response = super().changelist_view(request, extra_context=extra_context)
@@ -63,27 +102,126 @@ class ShopRentAdmin(admin.ModelAdmin):
                 qs = cl.queryset
                 totals = qs.aggregate(
                     total_final_amount=Sum('final_amount'),
+                    total_paid_amount=Sum('paid_amount'),
                 )
                 response.context_data['total_final_amount'] = totals['total_final_amount'] or 0
+                response.context_data['total_paid_amount'] = totals['total_paid_amount'] or 0
+                response.context_data['total_unpaid_amount'] = response.context_data['total_final_amount'] - response.context_data['total_paid_amount']
         except Exception:
             pass
         return response
 
 @admin.register(ShopPayment)
 class ShopPaymentAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/hotel/shoppayment/change_list.html'
     list_display = ('shop', 'payment_type', 'payment_date', 'amount', 'balance_after_payment')
     list_filter = (MonthNameListFilter, PaymentYearListFilter)
     search_fields = ('shop__shop_no',)
     ordering = ('-payment_date',)
     fields = ('shop', 'amount', 'payment_type', 'payment_date', 'comments')
 
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['bulk_entry_url'] = reverse('admin:hotel_shoppayment_bulk_entry')
+        response = super().changelist_view(request, extra_context=extra_context)
+        if not hasattr(response, 'context_data') or response.context_data is None:
+            return response
+        cl = response.context_data.get('cl')
+        if cl is not None:
+            # compute running balances for the page in one windowed query that
+            # returns only the page rows; the result_list is cached, so the
+            # template renders these objects
+            page = list(cl.result_list)
+            shop_ids = {p.shop_id for p in page}
+            balances = {
+                pk: billed - paid
+                for pk, billed, paid in ShopPayment.objects.filter(shop_id__in=shop_ids)
+                .with_running_balance(pks=[p.pk for p in page])
+                .values_list('pk', 'billed_to_date', 'paid_to_date')
+            }
+            for p in page:
+                p.running_balance = balances.get(p.pk)
+        return response
+
     def balance_after_payment(self, obj):
-        # show remaining balance for the shop after this payment (current totals)
-        bal = obj.shop.get_balance() if obj and obj.shop else None
+        # balance of the shop as of this payment (rents to date - payments to date)
+        bal = getattr(obj, 'running_balance', None)
         return f"{bal:.2f}" if bal is not None else ""
     balance_after_payment.short_description = 'Balance'
 
-
-
-
-
+    # --- bulk payment entry admin view -----------------------------------------------
+    class BulkPaymentForm(forms.Form):
+        payment_date = forms.DateField(initial=date.today, widget=forms.DateInput(attrs={'type': 'date'}))
+        payment_type = forms.ChoiceField(choices=ShopPayment.PAYMENTTYPE_CHOICES, initial='rent')
+
+    class BulkPaymentRowForm(forms.Form):
+        shop = forms.IntegerField(widget=forms.HiddenInput)
+        amount = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0.01, required=False)
+        comments = forms.CharField(required=False)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path('bulk-entry/', self.admin_site.admin_view(self.bulk_entry), name='hotel_shoppayment_bulk_entry'),
+        ]
+        return custom + urls
+
+    def bulk_entry(self, request):
+        """
+        Enter payments for many rented shops at once. The shops and their
+        outstanding balances come from one annotated query; the filled-in
+        rows are inserted with a single bulk_create and the derived balance,
+        rollup and allocation tables are refreshed once for the batch.
+        """
+        location = request.GET.get('location', '')
+        shops = Shop.objects.filter(status='rent').with_balance().order_by('shop_no')
+        if location:
+            shops = shops.filter(location=location)
+        shops = list(shops)
+        RowFormSet = forms.formset_factory(self.BulkPaymentRowForm, extra=0)
+
+        if request.method == 'POST':
+            form = self.BulkPaymentForm(request.POST)
+            formset = RowFormSet(request.POST, prefix='rows')
+            if form.is_valid() and formset.is_valid():
+                shop_ids = {shop.pk for shop in shops}
+                payment_date = form.cleaned_data['payment_date']
+                payments = [
+                    ShopPayment(
+                        shop_id=row['shop'],
+                        amount=row['amount'],
+                        payment_type=form.cleaned_data['payment_type'],
+                        payment_date=payment_date,
+                        comments=row['comments'],
+                    )
+                    for row in formset.cleaned_data
+                    if row.get('amount') and row['shop'] in shop_ids
+                ]
+                if payments:
+                    with transaction.atomic():
+                        ShopPayment.objects.bulk_create(payments, batch_size=500)
+                        # bulk_create skips the save signals; refresh derived tables once
+                        refresh_derived_totals(
+                            shop_ids=[p.shop_id for p in payments],
+                            periods=[(payment_date.year, payment_date.month)],
+                        )
+                    total = sum(p.amount for p in payments)
+                    messages.success(request, f'Recorded {len(payments)} payments totalling {total:.2f}.')
+                else:
+                    messages.warning(request, 'No amounts were entered; nothing was recorded.')
+                return redirect('admin:hotel_shoppayment_changelist')
+        else:
+            form = self.BulkPaymentForm()
+            formset = RowFormSet(initial=[{'shop': shop.pk} for shop in shops], prefix='rows')
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Bulk payment entry',
+            form=form,
+            formset=formset,
+            rows=list(zip(formset.forms, shops)),
+            locations=Shop.LOCATION_CHOICES,
+            selected_location=location,
+            total_outstanding=sum((shop.balance_amount for shop in shops), 0),
+        )
+        return TemplateResponse(request, 'admin/hotel/shoppayment/bulk_entry.html', context)
@@ -1,2 +1,5 @@
 from . import rent_report
+from . import arrears_report
+from . import forecast_report
+from . import occupancy_report
 from . import get_admin_urls
\ No newline at end of file
@@ -0,0 +1,189 @@
+from django.contrib import admin
+from django.db.models import Sum
+from django.template.response import TemplateResponse
+from decimal import Decimal
+import datetime
+import json
+from hotel.models import Shop, ShopDetail, ShopRent, ShopPayment
+from django.http import HttpResponse
+from django.contrib import messages
+from core.years import year_index
+import io
+
+# (label, minimum age in days) of the unpaid remainder, oldest last
+AGING_BUCKETS = [('0-29', 0), ('30-59', 30), ('60-89', 60), ('90+', 90)]
+
+
+# Custom admin view for the arrears aging report
+class ArrearsReportAdminView:
+    @staticmethod
+    def as_of_date(year_param):
+        # a past year is aged as of its last day, anything else as of today
+        today = datetime.date.today()
+        try:
+            year = int(year_param)
+        except ValueError:
+            return today
+        return min(datetime.date(year, 12, 31), today)
+
+    @staticmethod
+    def bucket_index(age_days):
+        index = 0
+        for i, (label, min_days) in enumerate(AGING_BUCKETS):
+            if age_days >= min_days:
+                index = i
+        return index
+
+    @staticmethod
+    def aging_rows(as_of, location_param='any'):
+        """
+        Allocate each shop's payments (up to as_of) against its rents oldest
+        first, and bucket whatever is left unpaid by age. Payments are summed
+        per shop in one grouped query; rents are then streamed once, ordered
+        by shop and date. Returns (rows, bucket_totals, grand_total).
+        """
+        shops = Shop.objects.all()
+        if location_param != 'any':
+            shops = shops.filter(location=location_param)
+        shop_info = {pk: (shop_no, location) for pk, shop_no, location in shops.values_list('pk', 'shop_no', 'location')}
+
+        paid = dict(
+            ShopPayment.objects.filter(shop__in=shops, payment_date__lte=as_of)
+            .order_by().values('shop_id').annotate(total=Sum('amount'))
+            .values_list('shop_id', 'total')
+        )
+        # tenancy running on as_of (the later one on a handover day)
+        tenants = dict(
+            ShopDetail.objects.active_on(as_of).filter(shop__in=shops)
+            .order_by('shop_id', 'start_date', 'id').values_list('shop_id', 'tenant__name')
+        )
+
+        rents = (
+            ShopRent.objects.filter(shop__in=shops, rent_date__lte=as_of)
+            .order_by('shop_id', 'rent_date', 'id')
+            .values_list('shop_id', 'rent_date', 'final_amount')
+        )
+
+        location_names = dict(Shop.LOCATION_CHOICES)
+        rows = []
+        bucket_totals = [Decimal('0')] * len(AGING_BUCKETS)
+        current = None
+
+        def close(state):
+            if state is None or not any(state['buckets']):
+                return
+            shop_no, location = shop_info[state['shop_id']]
+            rows.append({
+                'shop': shop_no,
+                'location': location_names.get(location, location),
+                'tenant': tenants.get(state['shop_id'], ''),
+                'buckets': [float(b) for b in state['buckets']],
+                'total': float(sum(state['buckets'])),
+                'oldest_due': state['oldest_due'].isoformat() if state['oldest_due'] else '',
+            })
+            for i, amount in enumerate(state['buckets']):
+                bucket_totals[i] += amount
+
+        for shop_id, rent_date, amount in rents.iterator():
+            if current is None or current['shop_id'] != shop_id:
+                close(current)
+                current = {
+                    'shop_id': shop_id,
+                    'credit': paid.get(shop_id) or Decimal('0'),
+                    'buckets': [Decimal('0')] * len(AGING_BUCKETS),
+                    'oldest_due': None,
+                }
+            applied = min(current['credit'], amount)
+            current['credit'] -= applied
+            unpaid = amount - applied
+            if unpaid > 0:
+                index = ArrearsReportAdminView.bucket_index((as_of - rent_date).days)
+                current['buckets'][index] += unpaid
+                current['oldest_due'] = current['oldest_due'] or rent_date
+        close(current)
+
+        rows.sort(key=lambda r: (r['location'], r['shop']))
+        return rows, [float(t) for t in bucket_totals], float(sum(bucket_totals))
+
+    @staticmethod
+    def dashboard_view(request):
+        # Filters
+        year_param = request.GET.get('year', 'any')
+        location_param = request.GET.get('location', 'any')
+        as_of = ArrearsReportAdminView.as_of_date(year_param)
+
+        rows, bucket_totals, grand_total = ArrearsReportAdminView.aging_rows(as_of, location_param)
+
+        # dropdowns for years and locations
+        years = year_index(ShopRent)
+        locations = Shop.LOCATION_CHOICES
+
+        context = dict(
+            admin.site.each_context(request),
+            rows=rows,
+            rows_json=json.dumps(rows),
+            bucket_labels=[label for label, _ in AGING_BUCKETS],
+            bucket_totals=bucket_totals,
+            grand_total=grand_total,
+            as_of=as_of,
+            years=years,
+            locations=locations,
+            selected_year=str(year_param),
+            selected_location=location_param,
+        )
+        return TemplateResponse(request, "admin/hotel/arrears_report.html", context)
+
+    @staticmethod
+    def export_pdf(request):
+        """Export the arrears aging table (filtered) as PDF."""
+        year_param = request.GET.get('year', 'any')
+        location_param = request.GET.get('location', 'any')
+        as_of = ArrearsReportAdminView.as_of_date(year_param)
+
+        rows, bucket_totals, grand_total = ArrearsReportAdminView.aging_rows(as_of, location_param)
+
+        try:
+            from reportlab.lib.pagesizes import letter, landscape
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet
+        except ImportError:
+            messages.error(request, "reportlab is required to export PDF. Install with: pip install reportlab")
+            return HttpResponse("reportlab required", status=400)
+
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
+        styles = getSampleStyleSheet()
+        elements = []
+        elements.append(Paragraph("Arrears Aging", styles['Title']))
+        elements.append(Spacer(1, 12))
+
+        # add filter summary
+        filter_line = f"As of: {as_of.isoformat()}"
+        if location_param != 'any':
+            location_display = dict(Shop.LOCATION_CHOICES).get(location_param, location_param)
+            filter_line += f"    Location: {location_display}"
+        elements.append(Paragraph(filter_line, styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+        data = [['Shop', 'Location', 'Tenant', 'Oldest due'] + [label for label, _ in AGING_BUCKETS] + ['Total']]
+        for row in rows:
+            data.append([row['shop'], row['location'], row['tenant'], row['oldest_due']]
+                        + [f"{b:.2f}" for b in row['buckets']] + [f"{row['total']:.2f}"])
+        data.append(['', '', '', 'Totals:'] + [f"{t:.2f}" for t in bucket_totals] + [f"{grand_total:.2f}"])
+
+        table = Table(data, repeatRows=1, hAlign='LEFT', colWidths=[60, 110, 130, 70, 70, 70, 70, 70, 80])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f0f0')),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('ALIGN', (4,1), (-1,-1), 'RIGHT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+        ]))
+        elements.append(table)
+        doc.build(elements)
+        buffer.seek(0)
+        resp = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        resp['Content-Disposition'] = f'attachment; filename="arrears_aging_{as_of.isoformat()}.pdf"'
+        return resp
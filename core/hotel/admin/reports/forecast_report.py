@@ -0,0 +1,100 @@
+from django.contrib import admin
+from django.template.response import TemplateResponse
+import csv
+import datetime
+import json
+from hotel.models import Shop
+from hotel.forecast import DEFAULT_SCENARIOS, Scenario, forecast, forecast_csv_rows
+from django.http import HttpResponse
+from django.contrib import messages
+
+HORIZONS = [12, 24, 36]
+
+
+# Custom admin view for the rent income forecast
+class ForecastReportAdminView:
+    @staticmethod
+    def _percent(value):
+        try:
+            return max(0.0, min(float(value), 100.0))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def scenarios_from_request(request):
+        """The built-in scenarios plus a 'Custom' one when any what-if field is filled in."""
+        increment = ForecastReportAdminView._percent(request.GET.get('increment'))
+        vacancy = ForecastReportAdminView._percent(request.GET.get('vacancy'))
+        discount = ForecastReportAdminView._percent(request.GET.get('discount'))
+        scenarios = list(DEFAULT_SCENARIOS)
+        if increment is not None or vacancy is not None or discount is not None:
+            scenarios.append(Scenario('Custom', increment, vacancy or 0, discount or 0))
+        return scenarios
+
+    @staticmethod
+    def filters(request):
+        try:
+            months = int(request.GET.get('months', 12))
+        except ValueError:
+            months = 12
+        months = months if months in HORIZONS else 12
+        location_param = request.GET.get('location', 'any')
+        return months, location_param
+
+    @staticmethod
+    def dashboard_view(request):
+        months, location_param = ForecastReportAdminView.filters(request)
+        scenarios = ForecastReportAdminView.scenarios_from_request(request)
+        try:
+            result = forecast(months, scenarios, location=None if location_param == 'any' else location_param)
+        except ImportError:
+            messages.error(request, "numpy is required for the rent forecast. Install with: pip install numpy")
+            return HttpResponse("numpy required", status=400)
+
+        month_labels = [datetime.date(y, m, 1).strftime('%b %Y') for y, m in result['periods']]
+        location_names = dict(Shop.LOCATION_CHOICES)
+        rows = []
+        for k, scenario in enumerate(scenarios):
+            values = [round(float(v), 2) for v in result['totals'][k]]
+            rows.append({
+                'scenario': scenario.name,
+                'values': values,
+                'total': round(sum(values), 2),
+                'locations': [
+                    {'location': location_names.get(code, code), 'total': round(float(result['by_location'][k, l].sum()), 2)}
+                    for l, code in enumerate(result['locations'])
+                ],
+            })
+
+        context = dict(
+            admin.site.each_context(request),
+            rows=rows,
+            chart_json=json.dumps({'labels': month_labels, 'datasets': [{'label': r['scenario'], 'data': r['values']} for r in rows]}),
+            month_labels=month_labels,
+            location_labels=[location_names.get(code, code) for code in result['locations']],
+            shop_count=result['shop_count'],
+            horizons=HORIZONS,
+            locations=Shop.LOCATION_CHOICES,
+            selected_months=months,
+            selected_location=location_param,
+            increment=request.GET.get('increment', ''),
+            vacancy=request.GET.get('vacancy', ''),
+            discount=request.GET.get('discount', ''),
+        )
+        return TemplateResponse(request, "admin/hotel/forecast_report.html", context)
+
+    @staticmethod
+    def export_csv(request):
+        """Export the forecast (scenario x location x month) as CSV."""
+        months, location_param = ForecastReportAdminView.filters(request)
+        scenarios = ForecastReportAdminView.scenarios_from_request(request)
+        try:
+            result = forecast(months, scenarios, location=None if location_param == 'any' else location_param)
+        except ImportError:
+            messages.error(request, "numpy is required for the rent forecast. Install with: pip install numpy")
+            return HttpResponse("numpy required", status=400)
+
+        resp = HttpResponse(content_type='text/csv')
+        resp['Content-Disposition'] = f'attachment; filename="rent_forecast_{months}m.csv"'
+        csv.writer(resp).writerows(forecast_csv_rows(result))
+        return resp
@@ -1,12 +1,21 @@
 from django.urls import path
 from django.contrib import admin
 from hotel.admin.reports.rent_report import RentReportAdminView
+from hotel.admin.reports.arrears_report import ArrearsReportAdminView
+from hotel.admin.reports.forecast_report import ForecastReportAdminView
+from hotel.admin.reports.occupancy_report import OccupancyReportAdminView
 
 def get_admin_urls(original_get_urls):
     def get_urls():
         my_urls = [
             path('report/rent/', admin.site.admin_view(RentReportAdminView.dashboard_view), name='rent_report'),
             path('report/rent/export_pdf/', admin.site.admin_view(RentReportAdminView.export_pdf), name='rent_report_export_pdf'),
+            path('report/arrears/', admin.site.admin_view(ArrearsReportAdminView.dashboard_view), name='arrears_report'),
+            path('report/arrears/export_pdf/', admin.site.admin_view(ArrearsReportAdminView.export_pdf), name='arrears_report_export_pdf'),
+            path('report/forecast/', admin.site.admin_view(ForecastReportAdminView.dashboard_view), name='forecast_report'),
+            path('report/forecast/export_csv/', admin.site.admin_view(ForecastReportAdminView.export_csv), name='forecast_report_export_csv'),
+            path('report/occupancy/', admin.site.admin_view(OccupancyReportAdminView.dashboard_view), name='occupancy_report'),
+            path('report/occupancy/export_pdf/', admin.site.admin_view(OccupancyReportAdminView.export_pdf), name='occupancy_report_export_pdf'),
         ]
         return my_urls + original_get_urls()
     return get_urls
@@ -0,0 +1,171 @@
+from django.contrib import admin
+from django.db.models import Q, Max, OuterRef, Subquery
+from django.template.response import TemplateResponse
+import datetime
+import json
+from hotel.models import OccupancyMonthlySummary, Shop, ShopDetail, ShopStatusChange
+from django.http import HttpResponse
+from django.contrib import messages
+from core.years import year_index
+import io
+
+
+# Custom admin view for the shop occupancy report
+class OccupancyReportAdminView:
+    @staticmethod
+    def monthly_rows(year_param='any', location_param='any'):
+        """
+        Month-end rented/empty/sold counts and vacant shop-days, read from
+        the precomputed monthly rollup in one query. Returns (rows, series):
+        rows summed over the selected locations, and the occupancy % of
+        each location per month for the trend chart.
+        """
+        base_qs = OccupancyMonthlySummary.objects.all()
+        if year_param != 'any':
+            try:
+                base_qs = base_qs.filter(year=int(year_param))
+            except ValueError:
+                pass
+        if location_param != 'any':
+            base_qs = base_qs.filter(location=location_param)
+
+        location_names = dict(Shop.LOCATION_CHOICES)
+        months = {}
+        series = {}
+        for entry in base_qs.order_by('year', 'month', 'location'):
+            key = (entry.year, entry.month)
+            row = months.setdefault(key, {
+                'period': f"{datetime.date(2000, entry.month, 1).strftime('%b')} {entry.year}",
+                'rented': 0, 'empty': 0, 'sold': 0, 'vacant_days': 0,
+            })
+            row['rented'] += entry.rented
+            row['empty'] += entry.empty
+            row['sold'] += entry.sold
+            row['vacant_days'] += entry.vacant_days
+            name = location_names.get(entry.location, entry.location)
+            series.setdefault(name, {})[key] = round(entry.occupancy_rate, 1)
+
+        rows = []
+        for key in sorted(months):
+            row = months[key]
+            lettable = row['rented'] + row['empty']
+            row['total'] = lettable + row['sold']
+            row['occupancy'] = round(row['rented'] * 100 / lettable, 1) if lettable else 0
+            rows.append(row)
+        # one point per month for every location, None where it had no shops yet
+        periods = sorted(months)
+        series = [
+            {'location': name, 'values': [values.get(key) for key in periods]}
+            for name, values in sorted(series.items())
+        ]
+        return rows, series
+
+    @staticmethod
+    def current_vacancies(location_param='any'):
+        """
+        Shops vacant today and since when: the later of the day their last
+        tenancy ended and the day their current status was recorded.
+        """
+        shops = Shop.objects.filter(Q(status='empty') | Q(status='rent', current_detail__isnull=True))
+        if location_param != 'any':
+            shops = shops.filter(location=location_param)
+        last_end = ShopDetail.objects.filter(shop=OuterRef('pk')).order_by().values('shop').annotate(day=Max('end_date')).values('day')
+        last_change = ShopStatusChange.objects.filter(shop=OuterRef('pk'), status=OuterRef('status')).order_by('-changed_on', '-id').values('changed_on')[:1]
+        shops = shops.annotate(last_end=Subquery(last_end), last_change=Subquery(last_change))
+
+        today = datetime.date.today()
+        location_names = dict(Shop.LOCATION_CHOICES)
+        rows = []
+        for shop_no, location, last_end, last_change in shops.values_list('shop_no', 'location', 'last_end', 'last_change'):
+            days = [d for d in (last_end and last_end + datetime.timedelta(days=1), last_change) if d]
+            since = max(days) if days else None
+            rows.append({
+                'shop': shop_no,
+                'location': location_names.get(location, location),
+                'since': since.isoformat() if since else '',
+                'days': (today - since).days if since and since <= today else 0,
+            })
+        rows.sort(key=lambda r: -r['days'])
+        return rows
+
+    @staticmethod
+    def dashboard_view(request):
+        # Filters
+        year_param = request.GET.get('year', 'any')
+        location_param = request.GET.get('location', 'any')
+
+        # roll the summary into a new month before reading it
+        OccupancyMonthlySummary.ensure_current()
+        rows, series = OccupancyReportAdminView.monthly_rows(year_param, location_param)
+        vacancies = OccupancyReportAdminView.current_vacancies(location_param)
+
+        # dropdowns for years and locations
+        years = year_index(OccupancyMonthlySummary)
+        locations = Shop.LOCATION_CHOICES
+
+        context = dict(
+            admin.site.each_context(request),
+            rows=rows,
+            labels_json=json.dumps([r['period'] for r in rows]),
+            rows_json=json.dumps(rows),
+            series_json=json.dumps(series),
+            vacancies=vacancies,
+            years=years,
+            locations=locations,
+            selected_year=str(year_param),
+            selected_location=location_param,
+        )
+        return TemplateResponse(request, "admin/hotel/occupancy_report.html", context)
+
+    @staticmethod
+    def export_pdf(request):
+        """Export the monthly occupancy table (filtered) as PDF."""
+        year_param = request.GET.get('year', 'any')
+        location_param = request.GET.get('location', 'any')
+
+        OccupancyMonthlySummary.ensure_current()
+        rows, _ = OccupancyReportAdminView.monthly_rows(year_param, location_param)
+
+        try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet
+        except ImportError:
+            messages.error(request, "reportlab is required to export PDF. Install with: pip install reportlab")
+            return HttpResponse("reportlab required", status=400)
+
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter)
+        styles = getSampleStyleSheet()
+        elements = []
+        elements.append(Paragraph("Shop Occupancy", styles['Title']))
+        elements.append(Spacer(1, 12))
+
+        # add filter summary
+        filter_line = f"Year: {year_param if year_param!='any' else 'Any'}"
+        if location_param != 'any':
+            location_display = dict(Shop.LOCATION_CHOICES).get(location_param, location_param)
+            filter_line += f"    Location: {location_display}"
+        elements.append(Paragraph(filter_line, styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+        data = [['Month', 'Rented', 'Empty', 'Sold', 'Total', 'Occupancy %', 'Vacant days']]
+        for row in rows:
+            data.append([row['period'], row['rented'], row['empty'], row['sold'], row['total'],
+                         f"{row['occupancy']:.1f}", row['vacant_days']])
+
+        table = Table(data, repeatRows=1, hAlign='LEFT', colWidths=[80, 60, 60, 60, 60, 80, 80])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f0f0')),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('ALIGN', (1,1), (-1,-1), 'RIGHT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ]))
+        elements.append(table)
+        doc.build(elements)
+        buffer.seek(0)
+        resp = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        resp['Content-Disposition'] = 'attachment; filename="shop_occupancy.pdf"'
+        return resp
@@ -1,71 +1,136 @@
 from django.contrib import admin
-from django.db.models import Sum
+from django.db.models import Sum, Q, F, ExpressionWrapper, DecimalField
 from django.template.response import TemplateResponse
 import datetime
-from hotel.models import ShopRent, Shop
+import json
+from hotel.models import RentMonthlySummary, Shop
 from django.http import HttpResponse
 from django.contrib import messages
 import io
+from core.years import year_index
+
+MONTH_NAMES = [datetime.date(2000, m, 1).strftime('%b') for m in range(1, 13)]
+
+PIVOT_METRICS = {
+    'amount': ExpressionWrapper(F('billed') - F('discounted'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    'collected': F('collected'),
+}
+
 
 # Custom admin view for Rent reports
 class RentReportAdminView:
+    @staticmethod
+    def pivot_year(year_param):
+        # the matrix covers one year: the selected one, else the latest on record
+        try:
+            return int(year_param)
+        except ValueError:
+            years = year_index(RentMonthlySummary)
+            return years[-1] if years else datetime.date.today().year
+
+    @staticmethod
+    def pivot_data(year, location_param='any', metric='amount'):
+        """
+        Locations as rows and months as columns for one year, built with a
+        single conditional-aggregation query over the monthly rollup.
+        Returns (rows, column_totals, grand_total).
+        """
+        value = PIVOT_METRICS.get(metric, PIVOT_METRICS['amount'])
+        base_qs = RentMonthlySummary.objects.filter(year=year)
+        if location_param != 'any':
+            base_qs = base_qs.filter(location=location_param)
+        months = {f'm{m}': Sum(value, filter=Q(month=m)) for m in range(1, 13)}
+        data = base_qs.values('location').annotate(**months, total=Sum(value)).order_by('location')
+
+        location_names = dict(Shop.LOCATION_CHOICES)
+        rows = []
+        column_totals = [0.0] * 12
+        grand_total = 0.0
+        for entry in data:
+            values = [float(entry[f'm{m}'] or 0) for m in range(1, 13)]
+            total = float(entry['total'] or 0)
+            rows.append({
+                'location': location_names.get(entry['location'], entry['location']),
+                'values': values,
+                'total': total,
+            })
+            column_totals = [a + b for a, b in zip(column_totals, values)]
+            grand_total += total
+        return rows, column_totals, grand_total
+
     @staticmethod
     def dashboard_view(request):
         # Filters
         year_param = request.GET.get('year', 'any')
         location_param = request.GET.get('location', 'any')
+        mode = request.GET.get('mode', 'list')
+        metric = request.GET.get('metric', 'amount')
 
-        base_qs = ShopRent.objects.select_related('shop')
+        # read the pre-aggregated (location, year, month) rollup, not the raw rent table
+        base_qs = RentMonthlySummary.objects.all()
 
         if year_param != 'any':
             try:
-                base_qs = base_qs.filter(rent_date__year=int(year_param))
+                base_qs = base_qs.filter(year=int(year_param))
             except ValueError:
                 pass
 
         if location_param != 'any':
-            base_qs = base_qs.filter(shop__location=location_param)
-
-        # aggregate by location and month
-        ledger_data = (
-            base_qs
-            .values('shop__location', 'rent_date__year', 'rent_date__month')
-            .annotate(
-                total_amount=Sum('final_amount'),
-            )
-            .order_by('shop__location', 'rent_date__year', 'rent_date__month')
-        )
+            base_qs = base_qs.filter(location=location_param)
+        if mode == 'pivot':
+            # the matrix below replaces the per-month list
+            base_qs = base_qs.none()
 
+        location_names = dict(Shop.LOCATION_CHOICES)
         rows = []
-        total_amount = 0.0
-        for entry in ledger_data:
-            location = entry['shop__location']
-            location_display = dict(Shop.LOCATION_CHOICES).get(location, location)
-            year = entry['rent_date__year']
-            month = entry['rent_date__month']
-            month_name = datetime.date(2000, month, 1).strftime('%B')
-            amount = float(entry.get('total_amount') or 0)
+        total_amount = total_billed = total_discount = total_collected = 0.0
+        for entry in base_qs.order_by('location', 'year', 'month'):
+            month_name = datetime.date(2000, entry.month, 1).strftime('%B')
+            amount = float(entry.net)
             rows.append({
-                'location': location_display,
-                'year': year,
+                'location': location_names.get(entry.location, entry.location),
+                'year': entry.year,
                 'month': month_name,
+                'billed': float(entry.billed),
+                'discount': float(entry.discounted),
                 'amount': amount,
+                'collected': float(entry.collected),
+                'shops': entry.shop_count,
             })
             total_amount += amount
-
-       
+            total_billed += float(entry.billed)
+            total_discount += float(entry.discounted)
+            total_collected += float(entry.collected)
 
         # dropdowns for years and locations
-        years_qs = ShopRent.objects.dates('rent_date', 'year').distinct()
-        years = [y.year for y in years_qs]
+        years = year_index(RentMonthlySummary)
         locations = Shop.LOCATION_CHOICES
 
+        pivot = {}
+        if mode == 'pivot':
+            pivot_year = RentReportAdminView.pivot_year(year_param)
+            pivot_rows, pivot_totals, pivot_grand_total = RentReportAdminView.pivot_data(pivot_year, location_param, metric)
+            pivot = dict(
+                pivot_year=pivot_year,
+                pivot_rows=pivot_rows,
+                pivot_totals=pivot_totals,
+                pivot_grand_total=pivot_grand_total,
+                pivot_json=json.dumps(pivot_rows),
+            )
+
         context = dict(
             admin.site.each_context(request),
+            **pivot,
+            mode=mode,
+            metric=metric,
+            month_names=MONTH_NAMES,
             rows=rows,
             years=years,
             locations=locations,
             total_amount=total_amount,
+            total_billed=total_billed,
+            total_discount=total_discount,
+            total_collected=total_collected,
             selected_year=str(year_param),
             selected_location=location_param,
         )
@@ -76,47 +141,36 @@ class RentReportAdminView:
         """Export aggregated ShopRent rows (filtered) as PDF."""
         year_param = request.GET.get('year', 'any')
         location_param = request.GET.get('location', 'any')
+        mode = request.GET.get('mode', 'list')
+        metric = request.GET.get('metric', 'amount')
 
-        base_qs = ShopRent.objects.select_related('shop')
+        base_qs = RentMonthlySummary.objects.all()
 
         if year_param != 'any':
             try:
-                base_qs = base_qs.filter(rent_date__year=int(year_param))
+                base_qs = base_qs.filter(year=int(year_param))
             except ValueError:
                 pass
 
         if location_param != 'any':
-            base_qs = base_qs.filter(shop__location=location_param)
+            base_qs = base_qs.filter(location=location_param)
 
-        try:
-            field_type = ShopRent._meta.get_field('rent_date').get_internal_type()
-            is_datetime = field_type == 'DateTimeField'
-        except Exception:
-            is_datetime = True
-
-        ledger_data = (
-            base_qs
-            .values('shop__location', 'rent_date__year', 'rent_date__month')
-            .annotate(
-                total_amount=Sum('final_amount'),
-            )
-            .order_by('shop__location', 'rent_date__year', 'rent_date__month')
-        )
+        if mode == 'pivot':
+            base_qs = base_qs.none()
 
+        location_names = dict(Shop.LOCATION_CHOICES)
         rows = []
-        total_amount = 0.0
-        for entry in ledger_data:
-            location = entry['shop__location']
-            location_display = dict(Shop.LOCATION_CHOICES).get(location, location)
-            year = entry['rent_date__year']
-            month = entry['rent_date__month']
-            month_name = datetime.date(2000, month, 1).strftime('%B')
-            rec = float(entry.get('total_amount') or 0)
-            rows.append([location_display, str(year), month_name, f"{rec:.2f}"])
+        total_amount = total_collected = 0.0
+        for entry in base_qs.order_by('location', 'year', 'month'):
+            month_name = datetime.date(2000, entry.month, 1).strftime('%B')
+            rec = float(entry.net)
+            col = float(entry.collected)
+            rows.append([location_names.get(entry.location, entry.location), str(entry.year), month_name, f"{rec:.2f}", f"{col:.2f}"])
             total_amount += rec
+            total_collected += col
 
         try:
-            from reportlab.lib.pagesizes import letter
+            from reportlab.lib.pagesizes import letter, landscape
             from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
             from reportlab.lib import colors
             from reportlab.lib.styles import getSampleStyleSheet
@@ -124,6 +178,9 @@ class RentReportAdminView:
             messages.error(request, "reportlab is required to export PDF. Install with: pip install reportlab")
             return HttpResponse("reportlab required", status=400)
 
+        if mode == 'pivot':
+            return RentReportAdminView._export_pivot_pdf(year_param, location_param, metric)
+
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
         styles = getSampleStyleSheet()
@@ -140,11 +197,11 @@ class RentReportAdminView:
         elements.append(Paragraph(filter_line, styles['Normal']))
         elements.append(Spacer(1, 12))
 
-        data = [['Location', 'Year', 'Month', 'Amount']]
+        data = [['Location', 'Year', 'Month', 'Amount', 'Collected']]
         data.extend(rows)
-        data.append(['', '', 'Totals:', f"{total_amount:.2f}"])
+        data.append(['', '', 'Totals:', f"{total_amount:.2f}", f"{total_collected:.2f}"])
 
-        table = Table(data, repeatRows=1, hAlign='LEFT', colWidths=[120, 60, 80, 120])
+        table = Table(data, repeatRows=1, hAlign='LEFT', colWidths=[120, 60, 80, 100, 100])
         table.setStyle(TableStyle([
             ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f0f0')),
             ('GRID', (0,0), (-1,-1), 0.5, colors.black),
@@ -160,4 +217,43 @@ class RentReportAdminView:
         resp['Content-Disposition'] = 'attachment; filename="rent_export.pdf"'
         return resp
 
+    @staticmethod
+    def _export_pivot_pdf(year_param, location_param, metric):
+        """Export the location x month matrix as a landscape PDF."""
+        from reportlab.lib.pagesizes import letter, landscape
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet
+
+        year = RentReportAdminView.pivot_year(year_param)
+        pivot_rows, column_totals, grand_total = RentReportAdminView.pivot_data(year, location_param, metric)
+
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), leftMargin=24, rightMargin=24)
+        styles = getSampleStyleSheet()
+        elements = []
+        elements.append(Paragraph(f"Rent {'Collected' if metric == 'collected' else 'Amount'} by Location - {year}", styles['Title']))
+        elements.append(Spacer(1, 12))
+
+        data = [['Location'] + MONTH_NAMES + ['Total']]
+        for row in pivot_rows:
+            data.append([row['location']] + [f"{v:.2f}" for v in row['values']] + [f"{row['total']:.2f}"])
+        data.append(['Totals:'] + [f"{v:.2f}" for v in column_totals] + [f"{grand_total:.2f}"])
 
+        table = Table(data, repeatRows=1, hAlign='LEFT', colWidths=[110] + [46] * 12 + [62])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f0f0f0')),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('ALIGN', (1,1), (-1,-1), 'RIGHT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTSIZE', (0,0), (-1,-1), 7),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+            ('FONTNAME', (-1,1), (-1,-1), 'Helvetica-Bold'),
+        ]))
+        elements.append(table)
+        doc.build(elements)
+        buffer.seek(0)
+        resp = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        resp['Content-Disposition'] = f'attachment; filename="rent_matrix_{year}.pdf"'
+        return resp
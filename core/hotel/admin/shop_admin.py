@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.contrib.admin import helpers
-from hotel.models import Shop, ShopDetail, ShopRent, Tenant
+from hotel.models import (
+    Shop, ShopDetail, ShopRent, Tenant, RentMonthlySummary, RentSchedule, refresh_derived_totals,
+    ShopStatusChange, OccupancyMonthlySummary,
+    SHOP_FILTER_CACHE_KEY, TENANT_FILTER_CACHE_KEY, TENANT_COUNT_CACHE_KEY, FILTER_CACHE_TIMEOUT,
+)
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin, ExportActionMixin
 from import_export.widgets import ForeignKeyWidget
@@ -14,6 +18,9 @@ import calendar
 from datetime import date
 from decimal import Decimal
 from django.shortcuts import redirect
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from core.years import year_index
 # from django.db.models import Sum
 
 class ShopResource(resources.ModelResource):
@@ -36,15 +43,44 @@ class ShopResource(resources.ModelResource):
         fields = ('location', 'shop_no', 'status', 'amount', 'created_at')
         model = Shop
 
+class BalanceListFilter(admin.SimpleListFilter):
+    title = 'Balance'
+    parameter_name = 'balance'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('arrears', 'In arrears (balance > 0)'),
+            ('settled', 'Settled (balance = 0)'),
+            ('credit', 'In credit (balance < 0)'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'arrears':
+            return queryset.filter(balance_record__outstanding__gt=0)
+        if self.value() == 'settled':
+            return queryset.filter(balance_record__outstanding=0)
+        if self.value() == 'credit':
+            return queryset.filter(balance_record__outstanding__lt=0)
+        return queryset
+
+class ShopStatusChangeInline(admin.TabularInline):
+    # status changes are recorded on save; the inline lets the date be corrected
+    model = ShopStatusChange
+    fields = ('status', 'changed_on', 'created_at')
+    readonly_fields = ('created_at',)
+    extra = 0
+
+
 @admin.register(Shop)
 class ShopAdmin(ExportActionMixin, ImportExportModelAdmin):
     resource_class = ShopResource
-    list_display = ('location', 'shop_no', 'status', 'sold_amount', 'balance', 'created_at')
-    list_filter = ('location', 'status', 'created_at')
+    list_display = ('location', 'shop_no', 'status', 'tenant', 'sold_amount', 'balance', 'created_at')
+    list_filter = ('location', 'status', BalanceListFilter, 'created_at')
     search_fields = ('shop_no', 'detail')
     ordering = ('shop_no',)
     fields = ('location', 'shop_no', 'status', 'sold_amount', 'detail')
     actions = ['bulk_update_location']
+    inlines = [ShopStatusChangeInline]
     list_editable = ['location']
     list_display_links = ['shop_no']
 
@@ -58,10 +94,21 @@ class ShopAdmin(ExportActionMixin, ImportExportModelAdmin):
             obj.added_by = request.user
         super().save_model(request, obj, form, change)
 
+    def get_queryset(self, request):
+        # join the denormalized ShopBalance row instead of 3 aggregates per row,
+        # and the current tenancy instead of scanning each shop's details
+        return super().get_queryset(request).select_related('balance_record', 'current_detail__tenant')
+
+    def tenant(self, obj):
+        return obj.current_detail.tenant.name if obj.current_detail else '-'
+    tenant.short_description = 'Current Tenant'
+    tenant.admin_order_field = 'current_detail__tenant__name'
+
     def balance(self, obj):
-        bal = obj.get_balance()
-        return f"{bal:.2f}"
+        # a missing balance row is rebuilt from the history, not shown as zero
+        return f"{obj.get_balance():.2f}"
     balance.short_description = 'Balance'
+    balance.admin_order_field = 'balance_record__outstanding'
     
     # change_list_template = 'admin/change_list.html'
     
@@ -106,7 +153,12 @@ class ShopAdmin(ExportActionMixin, ImportExportModelAdmin):
             form = self.LocationForm(request.POST)
             if form.is_valid():
                 new_location = form.cleaned_data['location']
+                moved = set(shops.values_list('location', flat=True)) | {new_location}
+                shop_ids = list(shops.values_list('pk', flat=True))
                 count = shops.update(location=new_location)
+                # update() skips the save signals; regroup the moved history
+                RentMonthlySummary.rebuild(locations=moved)
+                OccupancyMonthlySummary.refresh_shops(shop_ids)
                 messages.success(request, f'Updated location for {count} shops.')
                 return redirect('admin:hotel_shop_changelist')
         else:
@@ -125,8 +177,14 @@ class ShopListFilter(admin.SimpleListFilter):
     template = 'admin/select_filter.html'  # Use select box
 
     def lookups(self, request, model_admin):
-        shops = set(ShopDetail.objects.values_list('shop__id', 'shop__shop_no'))
-        return [(shop_id, shop_no) for shop_id, shop_no in shops if shop_id]
+        choices = cache.get(SHOP_FILTER_CACHE_KEY)
+        if choices is None:
+            choices = list(
+                ShopDetail.objects.order_by('shop__shop_no')
+                .values_list('shop_id', 'shop__shop_no').distinct()
+            )
+            cache.set(SHOP_FILTER_CACHE_KEY, choices, FILTER_CACHE_TIMEOUT)
+        return choices
 
     def queryset(self, request, queryset):
         if self.value():
@@ -139,14 +197,47 @@ class TenantListFilter(admin.SimpleListFilter):
     template = 'admin/select_filter.html'  # Use select box
 
     def lookups(self, request, model_admin):
-        tenants = set(ShopDetail.objects.values_list('tenant__id', 'tenant__name'))
-        return [(tenant_id, name) for tenant_id, name in tenants if tenant_id]
+        choices = cache.get(TENANT_FILTER_CACHE_KEY)
+        if choices is None:
+            choices = list(
+                ShopDetail.objects.order_by('tenant__name')
+                .values_list('tenant_id', 'tenant__name').distinct()
+            )
+            cache.set(TENANT_FILTER_CACHE_KEY, choices, FILTER_CACHE_TIMEOUT)
+        return choices
 
     def queryset(self, request, queryset):
         if self.value():
             return queryset.filter(tenant__id=self.value())
         return queryset
 
+class TenantAutocompleteListFilter(TenantListFilter):
+    """
+    Tenant filter for large tenant lists: a text box backed by the admin
+    autocomplete endpoint, so the sidebar never loads the whole table.
+    """
+    template = 'admin/hotel/autocomplete_filter.html'
+    autocomplete_field = ('hotel', 'shopdetail', 'tenant')
+
+    def lookups(self, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        self.selected_label = ''
+        if self.value():
+            self.selected_label = Tenant.objects.filter(pk=self.value()).values_list('name', flat=True).first() or ''
+        self.app_label, self.model_name, self.field_name = self.autocomplete_field
+        # the template swaps the placeholder for the chosen tenant id
+        self.select_query_string = changelist.get_query_string({self.parameter_name: '__value__'})
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+        }
+
 class ShopDetailResource(resources.ModelResource):
     
     shop = fields.Field(
@@ -163,18 +254,29 @@ class ShopDetailResource(resources.ModelResource):
         # exclude = ('id', 'shop_id', 'tenant_id')
         # import_id_fields = ('shop__shop_no', 'tenant__cnic')
         # skip_unchanged = True
-        fields = ('id', 'shop', 'tenant', 'rent_amount', 'security_amount', 'increment', 'start_date', 'detail') 
+        fields = ('id', 'shop', 'tenant', 'rent_amount', 'security_amount', 'increment', 'start_date', 'end_date', 'detail') 
         model = ShopDetail
     
 @admin.register(ShopDetail)
 class ShopDetailAdmin(ExportActionMixin, ImportExportModelAdmin):
     resource_class = ShopDetailResource
     change_list_template = "admin/hotel/shopdetail/change_list.html"
-    list_display = ('shop', 'tenant', 'rent_amount', 'security_amount', 'increment', 'start_date', 'detail')
+    list_display = ('shop', 'tenant', 'rent_amount', 'security_amount', 'increment', 'start_date', 'end_date', 'detail')
     # make the right-side filters render as dropdowns showing only related values
     list_filter = (ShopListFilter, TenantListFilter)
     search_fields = ('shop__shop_no', 'tenant__name')
     ordering = ('-id',)
+    # above this many tenants the tenant filter becomes an autocomplete box
+    tenant_filter_select_limit = 200
+
+    def get_list_filter(self, request):
+        tenant_count = cache.get(TENANT_COUNT_CACHE_KEY)
+        if tenant_count is None:
+            tenant_count = Tenant.objects.count()
+            cache.set(TENANT_COUNT_CACHE_KEY, tenant_count, FILTER_CACHE_TIMEOUT)
+        if tenant_count > self.tenant_filter_select_limit:
+            return (ShopListFilter, TenantAutocompleteListFilter)
+        return super().get_list_filter(request)
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         # restrict the shop dropdown on add/edit to shops with status == 'rent'
@@ -205,11 +307,16 @@ class ShopDetailAdmin(ExportActionMixin, ImportExportModelAdmin):
     class BulkRentForm(forms.Form):
         month = forms.ChoiceField(choices=[(i, calendar.month_name[i]) for i in range(1, 13)])
         year = forms.ChoiceField()
+        location = forms.ChoiceField(choices=[('', 'All locations')] + Shop.LOCATION_CHOICES, required=False)
+        dry_run = forms.BooleanField(required=False, initial=True, label='Preview only (do not create)')
 
         def __init__(self, *args, **kwargs):
             current_year = date.today().year
             current_month = date.today().month
-            years = [(y, str(y)) for y in range(current_year - 2, current_year + 6)]
+            # reach back to the earliest tenancy so past months can be backfilled
+            detail_years = year_index(ShopDetail, 'start_date')
+            first_year = min(detail_years[0], current_year - 2) if detail_years else current_year - 2
+            years = [(y, str(y)) for y in range(first_year, current_year + 6)]
             super().__init__(*args, **kwargs)
             self.fields['year'].choices = years
             # set defaults to current month/year
@@ -223,58 +330,107 @@ class ShopDetailAdmin(ExportActionMixin, ImportExportModelAdmin):
         ]
         return custom + urls
 
+    def _plan_rents(self, year, month, location=None, dry_run=False):
+        """
+        Build the unsaved ShopRent rows for year/month in memory from the
+        precomputed RentSchedule (one joined query), skipping the
+        (shop, year, month) keys that already exist.
+        Returns (rents, summary): one row per location, sorted by its code.
+        On a dry run the schedules extended for the period are rolled back.
+        """
+        with transaction.atomic():
+            plan = self._read_plan(year, month, location)
+            if dry_run:
+                transaction.set_rollback(True)
+        return plan
+
+    def _read_plan(self, year, month, location):
+        existing = ShopRent.objects.filter(year=year, month=month)
+        if location:
+            existing = existing.filter(shop__location=location)
+        existing = set(existing.values_list('shop_id', flat=True))
+        locations = dict(Shop.LOCATION_CHOICES)
+        rent_date = date(year, month, 1)
+        rents = []
+        summary = {}
+        for shop_id, shop_location, amount, is_increment in RentSchedule.rents_for_period(year, month, location):
+            row = summary.setdefault(shop_location, {
+                'code': shop_location, 'location': locations.get(shop_location, shop_location),
+                'created': 0, 'skipped': 0, 'amount': Decimal('0'),
+            })
+            if shop_id in existing:
+                row['skipped'] += 1
+                continue
+            # year, month and final_amount are generated by the database
+            rents.append(ShopRent(
+                shop_id=shop_id,
+                amount=amount,
+                is_increment=is_increment,
+                discount=0,
+                is_percentage=False,
+                rent_date=rent_date,
+            ))
+            row['created'] += 1
+            row['amount'] += amount
+        return rents, [summary[k] for k in sorted(summary)]
+
     def bulk_create_rents(self, request):
         if request.method == 'POST':
             form = self.BulkRentForm(request.POST)
             if form.is_valid():
                 month = int(form.cleaned_data['month'])
                 year = int(form.cleaned_data['year'])
-                created = 0
-                skipped = 0
-                shop_details = ShopDetail.objects.filter(shop__status='rent').select_related('shop').distinct()
-                with transaction.atomic():
-                    for sd in shop_details:
-                        # skip if rent record already exists for that shop/year/month
-                        exists = ShopRent.objects.filter(shop=sd.shop, year=year, month=month).exists()
-                        if exists:
-                            skipped += 1
-                            continue
-                        # apply annual increment (add ShopDetail.increment to base rent)
-                        started_at = sd.start_date
-                        now = date.today()
-                        months_diff = (now.year - started_at.year) * 12 + (now.month - started_at.month)
-                        # compute full years since start (annual increment)
-                        years = months_diff // 12 if months_diff > 0 else 0
-                        amount = sd.rent_amount or Decimal('0')
-                        increment = sd.increment or Decimal('0')
-                        if years > 0 and increment > 0:
-                            increment = increment / 100 * sd.rent_amount
-                            amount += increment * years
-                            is_increment = True
-                        else:
-                            is_increment = False
-                        final_amount = amount
-                        rent_date = date(year, month, 1)
-                        ShopRent.objects.create(
-                            shop=sd.shop,
-                            amount=amount,
-                            is_increment=bool(is_increment),
-                            discount=0,
-                            is_percentage=False,
-                            final_amount=final_amount,  # model save will compute year/month; final_amount remains None until save logic runs if any
-                            rent_date=rent_date
-                        )
-                        created += 1
-                messages.success(request, f'Created {created} rents, skipped {skipped} already-existing.')
-                # Redirect back to changelist
-                return TemplateResponse(request, 'admin/hotel/shopdetail/bulk_create_result.html', {'created': created, 'skipped': skipped})
+                location = form.cleaned_data['location']
+                dry_run = form.cleaned_data['dry_run']
+                rents, summary = self._plan_rents(year, month, location, dry_run)
+                created = len(rents)
+                skipped = sum(row['skipped'] for row in summary)
+                if not dry_run:
+                    # the unique (shop, year, month) constraint makes re-runs and
+                    # parallel runs idempotent: rows created meanwhile are ignored.
+                    # Count the planned shops' rents per location before and after
+                    # the insert so each location row reports what was inserted
+                    period = (
+                        ShopRent.objects.filter(year=year, month=month, shop_id__in=[r.shop_id for r in rents])
+                        .order_by().values('shop__location')
+                        .annotate(count=Count('id'), amount=Sum('amount'))
+                        .values_list('shop__location', 'count', 'amount')
+                    )
+                    with transaction.atomic():
+                        before = {location: (count, amount) for location, count, amount in period.all()}
+                        ShopRent.objects.bulk_create(rents, batch_size=500, ignore_conflicts=True)
+                        after = {location: (count, amount) for location, count, amount in period.all()}
+                    for row in summary:
+                        count, amount = after.get(row['code'], (0, Decimal('0')))
+                        count_before, amount_before = before.get(row['code'], (0, Decimal('0')))
+                        row['skipped'] += row['created'] - (count - count_before)
+                        row['created'], row['amount'] = count - count_before, amount - amount_before
+                    created = sum(row['created'] for row in summary)
+                    skipped = sum(row['skipped'] for row in summary)
+                    # bulk_create skips the save signals; refresh derived tables once
+                    refresh_derived_totals(shop_ids=[r.shop_id for r in rents], periods=[(year, month)])
+                    messages.success(request, f'Created {created} rents, skipped {skipped} already-existing.')
+                context = dict(
+                    self.admin_site.each_context(request),
+                    title='Bulk create rents',
+                    created=created,
+                    skipped=skipped,
+                    total_amount=sum((row['amount'] for row in summary), Decimal('0')),
+                    summary=summary,
+                    dry_run=dry_run,
+                    location=location,
+                    month=month,
+                    month_name=calendar.month_name[month],
+                    year=year,
+                )
+                return TemplateResponse(request, 'admin/hotel/shopdetail/bulk_create_result.html', context)
         else:
             form = self.BulkRentForm()
 
         context = dict(
             self.admin_site.each_context(request),
             form=form,
-            title='Bulk create rents for all "rent" shops',
+            title='Bulk create rents for let shops',
         )
         return TemplateResponse(request, 'admin/hotel/shopdetail/bulk_create_form.html', context)
 
@@ -0,0 +1,62 @@
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from hotel.models import ShopRent, refresh_derived_totals
+
+
+class Command(BaseCommand):
+    help = "Set the discount on matching ShopRent rows with chunked UPDATEs (final_amount is regenerated by the database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('discount', help='Discount value (flat amount, or a percentage with --percentage).')
+        parser.add_argument('--percentage', action='store_true', help='Treat the discount as a percentage of the amount.')
+        parser.add_argument('--year', type=int)
+        parser.add_argument('--month', type=int)
+        parser.add_argument('--location', help='Only shops at this location.')
+        parser.add_argument('--shop', type=int, action='append', dest='shop_ids',
+                            help='Only the given shop id (can be repeated).')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per UPDATE, by primary key range.')
+
+    def handle(self, *args, **options):
+        try:
+            discount = Decimal(options['discount'])
+        except InvalidOperation:
+            raise CommandError('discount must be a number')
+
+        rents = ShopRent.objects.all()
+        if options['year']:
+            rents = rents.filter(year=options['year'])
+        if options['month']:
+            rents = rents.filter(month=options['month'])
+        if options['location']:
+            rents = rents.filter(shop__location=options['location'])
+        if options['shop_ids']:
+            rents = rents.filter(shop_id__in=options['shop_ids'])
+
+        try:
+            ShopRent.check_discount(rents, discount, options['percentage'])
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        bounds = rents.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write('No matching rents.')
+            return
+
+        changed = 0
+        affected = set()
+        chunk = options['chunk_size']
+        for low in range(bounds['low'], bounds['high'] + 1, chunk):
+            count, keys = ShopRent.apply_discount(
+                rents.filter(pk__gte=low, pk__lt=low + chunk), discount, options['percentage'], refresh=False,
+            )
+            changed += count
+            affected |= keys
+        # refresh the derived tables once for everything that changed
+        if affected:
+            refresh_derived_totals(
+                shop_ids={shop_id for shop_id, _, _ in affected},
+                periods={(year, month) for _, year, month in affected},
+            )
+        self.stdout.write(self.style.SUCCESS(f"Discount applied: {changed} rents changed."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from hotel.models import Bank, ShopRent, Expense, next_period
+
+
+class Command(BaseCommand):
+    help = "Fill in the (year, month) window covered by existing hotel Bank closes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Overwrite windows that are already set.')
+
+    def handle(self, *args, **options):
+        # the first close covers everything from the oldest rent/expense month
+        firsts = [
+            qs.order_by('year', 'month').values_list('year', 'month').first()
+            for qs in (ShopRent.objects, Expense.objects)
+        ]
+        first_start = min((p for p in firsts if p), default=None)
+
+        changed = []
+        previous = None
+        for bank in Bank.objects.order_by('created_at').only('id', 'year', 'month', 'start_year', 'start_month'):
+            start = next_period(previous.year, previous.month) if previous else first_start
+            previous = bank
+            if start is None or (bank.start_year and not options['force']):
+                continue
+            if (bank.start_year, bank.start_month) != start:
+                bank.start_year, bank.start_month = start
+                changed.append(bank)
+
+        with transaction.atomic():
+            Bank.objects.bulk_update(changed, ['start_year', 'start_month'], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"Bank periods backfilled: {len(changed)} updated."))
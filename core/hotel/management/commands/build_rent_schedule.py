@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from hotel.models import RentSchedule
+
+
+class Command(BaseCommand):
+    help = "Precompute the monthly RentSchedule (compounding annual increments) for shop details."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--detail', type=int, action='append', dest='detail_ids',
+                            help='Only rebuild the given ShopDetail id (can be repeated).')
+        parser.add_argument('--until', help='Last period to schedule as YYYY-MM (default: 24 months ahead).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            try:
+                year, month = (int(part) for part in options['until'].split('-'))
+            except ValueError:
+                raise CommandError('--until must be YYYY-MM')
+            until = (year, month)
+        written = RentSchedule.build(detail_ids=options['detail_ids'], until=until, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rent schedule built: {written} monthly rows."))
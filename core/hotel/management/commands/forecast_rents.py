@@ -0,0 +1,44 @@
+import csv
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from hotel.forecast import DEFAULT_SCENARIOS, Scenario, forecast, forecast_csv_rows
+
+
+def parse_scenario(value):
+    # name:increment:vacancy:discount, increment may be blank to keep each tenancy's own
+    parts = value.split(':')
+    if len(parts) != 4:
+        raise CommandError(f'Invalid scenario {value!r}, expected name:increment:vacancy:discount')
+    name, increment, vacancy, discount = parts
+    try:
+        return Scenario(name, float(increment) if increment else None, float(vacancy or 0), float(discount or 0))
+    except ValueError:
+        raise CommandError(f'Invalid scenario {value!r}, percentages must be numbers')
+
+
+class Command(BaseCommand):
+    help = "Project rent income for the next N months under what-if scenarios (requires numpy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12)
+        parser.add_argument('--location', help='Only shops at this location.')
+        parser.add_argument('--scenario', action='append', type=parse_scenario, dest='scenarios',
+                            help='name:increment:vacancy:discount (repeatable; replaces the defaults).')
+        parser.add_argument('--csv', help='Write scenario x location x month rows to this file ("-" for stdout).')
+
+    def handle(self, *args, **options):
+        try:
+            result = forecast(options['months'], options['scenarios'] or DEFAULT_SCENARIOS, location=options['location'])
+        except ImportError:
+            raise CommandError('numpy is required for the rent forecast. Install with: pip install numpy')
+
+        if options['csv']:
+            if options['csv'] == '-':
+                csv.writer(sys.stdout).writerows(forecast_csv_rows(result))
+                return
+            with open(options['csv'], 'w', newline='') as fh:
+                csv.writer(fh).writerows(forecast_csv_rows(result))
+
+        self.stdout.write(f"{result['shop_count']} rented shops, {options['months']} months")
+        for scenario, totals in zip(result['scenarios'], result['totals']):
+            self.stdout.write(f"{scenario.name:<20} {totals.sum():>16,.2f}")
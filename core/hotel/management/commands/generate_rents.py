@@ -0,0 +1,70 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from hotel.models import RentSchedule, ShopRent, next_period, refresh_derived_totals
+
+
+def parse_period(value):
+    try:
+        year, month = (int(part) for part in value.split('-'))
+        date(year, month, 1)
+    except ValueError:
+        raise CommandError(f'Invalid period {value!r}, expected YYYY-MM')
+    return (year, month)
+
+
+class Command(BaseCommand):
+    help = "Generate (or backfill) ShopRent rows from the RentSchedule for a range of months."
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', help='First period, YYYY-MM.')
+        parser.add_argument('end', nargs='?', help='Last period, YYYY-MM (default: same as start).')
+        parser.add_argument('--location', help='Only shops at this location.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be created.')
+
+    def handle(self, *args, **options):
+        start = parse_period(options['start'])
+        end = parse_period(options['end']) if options['end'] else start
+        if end < start:
+            raise CommandError('end period is before start period')
+
+        periods = []
+        period = start
+        while period <= end:
+            periods.append(period)
+            period = next_period(*period)
+
+        total = 0
+        shop_ids = set()
+        with transaction.atomic():
+            for year, month in periods:
+                existing = set(ShopRent.objects.filter(year=year, month=month).values_list('shop_id', flat=True))
+                rents = [
+                    ShopRent(shop_id=shop_id, amount=amount, is_increment=is_increment,
+                             discount=0, is_percentage=False, rent_date=date(year, month, 1))
+                    for shop_id, _, amount, is_increment in RentSchedule.rents_for_period(year, month, options['location'])
+                    if shop_id not in existing
+                ]
+                created = len(rents)
+                if not options['dry_run'] and rents:
+                    # rows written meanwhile by another run are ignored by the
+                    # unique constraint; count what was actually inserted
+                    period_rents = ShopRent.objects.filter(year=year, month=month, shop_id__in=[r.shop_id for r in rents])
+                    with transaction.atomic():
+                        before = period_rents.count()
+                        ShopRent.objects.bulk_create(rents, batch_size=500, ignore_conflicts=True)
+                        created = period_rents.count() - before
+                shop_ids.update(r.shop_id for r in rents)
+                total += created
+                self.stdout.write(f"{year}-{month:02d}: {created} rents")
+            if options['dry_run']:
+                # rents_for_period extends missing schedules; leave nothing behind
+                transaction.set_rollback(True)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry run: {total} rents would be created."))
+            return
+        # bulk_create skips the save signals; refresh derived tables once for the whole range
+        if shop_ids:
+            refresh_derived_totals(shop_ids=shop_ids, periods=periods)
+        self.stdout.write(self.style.SUCCESS(f"Created {total} rents over {len(periods)} month(s)."))
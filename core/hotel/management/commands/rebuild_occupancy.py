@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from hotel.models import OccupancyMonthlySummary, Shop
+
+
+class Command(BaseCommand):
+    help = "Regenerate the OccupancyMonthlySummary rollup from shop status history and tenancies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', action='append', dest='locations',
+                            choices=[value for value, _ in Shop.LOCATION_CHOICES],
+                            help='Only rebuild the given location (can be repeated).')
+
+    def handle(self, *args, **options):
+        written = OccupancyMonthlySummary.rebuild(locations=options['locations'])
+        self.stdout.write(self.style.SUCCESS(f"Occupancy summary rebuilt: {written} rows."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from hotel.models import RentMonthlySummary, Shop
+
+
+class Command(BaseCommand):
+    help = "Regenerate the RentMonthlySummary rollup from ShopRent/ShopPayment."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', action='append', dest='locations',
+                            choices=[value for value, _ in Shop.LOCATION_CHOICES],
+                            help='Only rebuild the given location (can be repeated).')
+        parser.add_argument('--year', type=int, help='Only rebuild months of this year.')
+
+    def handle(self, *args, **options):
+        periods = None
+        if options['year']:
+            periods = [(options['year'], month) for month in range(1, 13)]
+        written = RentMonthlySummary.rebuild(locations=options['locations'], periods=periods)
+        self.stdout.write(self.style.SUCCESS(f"Rent summary rebuilt: {written} rows."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from hotel.models import ShopBalance
+
+
+class Command(BaseCommand):
+    help = "Reconcile the denormalized ShopBalance table with the full ShopRent/ShopPayment history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shop_ids',
+                            help='Only rebuild the given shop id (can be repeated).')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created, updated = ShopBalance.rebuild(shop_ids=options['shop_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Shop balances rebuilt: {created} created, {updated} corrected."
+        ))
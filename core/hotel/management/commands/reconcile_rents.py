@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from hotel.models import ShopRent
+
+
+class Command(BaseCommand):
+    help = "Re-allocate ShopPayment totals to ShopRent rows oldest first (paid_amount / is_settled)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, action='append', dest='shop_ids',
+                            help='Only reconcile the given shop id (can be repeated).')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        changed = ShopRent.reconcile(shop_ids=options['shop_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rents reconciled: {changed} allocations updated."))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:42
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Max, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_shop_balances(apps, schema_editor):
+    Shop = apps.get_model('hotel', 'Shop')
+    ShopRent = apps.get_model('hotel', 'ShopRent')
+    ShopPayment = apps.get_model('hotel', 'ShopPayment')
+    ShopBalance = apps.get_model('hotel', 'ShopBalance')
+
+    rents = {
+        r['shop_id']: r for r in ShopRent.objects.order_by().values('shop_id')
+        .annotate(total=Sum(Coalesce('final_amount', 'amount')), last=Max('rent_date'))
+    }
+    payments = {
+        p['shop_id']: p for p in ShopPayment.objects.order_by().values('shop_id')
+        .annotate(total=Sum('amount'), last=Max('payment_date'))
+    }
+    balances = []
+    for shop_id in Shop.objects.values_list('pk', flat=True):
+        rent = rents.get(shop_id, {})
+        payment = payments.get(shop_id, {})
+        billed = rent.get('total') or Decimal('0')
+        paid = payment.get('total') or Decimal('0')
+        balances.append(ShopBalance(
+            shop_id=shop_id, billed=billed, paid=paid, outstanding=billed - paid,
+            last_rent_date=rent.get('last'), last_payment_date=payment.get('last'),
+        ))
+    ShopBalance.objects.bulk_create(balances, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0004_alter_tenant_contact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billed', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_rent_date', models.DateField(blank=True, null=True)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance_record', to='hotel.shop')),
+            ],
+            options={
+                'verbose_name': 'Shop Balance',
+                'verbose_name_plural': 'Shop Balances',
+                'ordering': ['shop'],
+            },
+        ),
+        migrations.RunPython(populate_shop_balances, migrations.RunPython.noop),
+    ]
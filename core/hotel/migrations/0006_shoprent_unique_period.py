@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:44
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_periods(apps, schema_editor):
+    # refuse to guess which duplicate to keep; list them so they can be fixed by hand
+    ShopRent = apps.get_model('hotel', 'ShopRent')
+    duplicates = list(
+        ShopRent.objects.order_by().values('shop_id', 'year', 'month')
+        .annotate(n=Count('id')).filter(n__gt=1)[:20]
+    )
+    if duplicates:
+        rows = ', '.join(f"shop {d['shop_id']} {d['year']}-{d['month']:02d}" for d in duplicates)
+        raise RuntimeError(f"Duplicate ShopRent rows must be merged before adding the unique period constraint: {rows}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0005_shopbalance'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_periods, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoprent',
+            constraint=models.UniqueConstraint(fields=('shop', 'year', 'month'), name='unique_shop_rent_period'),
+        ),
+    ]
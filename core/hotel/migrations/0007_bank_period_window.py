@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0006_shoprent_unique_period'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bank',
+            name='start_month',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='bank',
+            name='start_year',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['year', 'month'], name='expense_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoprent',
+            index=models.Index(fields=['year', 'month'], name='shoprent_period_idx'),
+        ),
+    ]
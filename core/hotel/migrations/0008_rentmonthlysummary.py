@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:47
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rent_summary(apps, schema_editor):
+    ShopRent = apps.get_model('hotel', 'ShopRent')
+    ShopPayment = apps.get_model('hotel', 'ShopPayment')
+    RentMonthlySummary = apps.get_model('hotel', 'RentMonthlySummary')
+
+    rows = {}
+    for r in ShopRent.objects.order_by().values('shop__location', 'year', 'month').annotate(
+        billed=Sum('amount'), net=Sum(Coalesce('final_amount', 'amount')), shop_count=Count('id'),
+    ):
+        rows[(r['shop__location'], r['year'], r['month'])] = RentMonthlySummary(
+            location=r['shop__location'], year=r['year'], month=r['month'],
+            billed=r['billed'], discounted=r['billed'] - r['net'], shop_count=r['shop_count'],
+        )
+    for p in ShopPayment.objects.order_by().values('shop__location', 'year', 'month').annotate(collected=Sum('amount')):
+        key = (p['shop__location'], p['year'], p['month'])
+        row = rows.setdefault(key, RentMonthlySummary(location=key[0], year=key[1], month=key[2]))
+        row.collected = p['collected']
+    RentMonthlySummary.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0007_bank_period_window'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(choices=[('second', 'Second Floor'), ('second-cab', 'Second Floor Cabinet'), ('third', 'Third Floor'), ('third-cab', 'Third Floor Cabinet')], max_length=10)),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('billed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discounted', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('shop_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Rent Monthly Summary',
+                'verbose_name_plural': 'Rent Monthly Summaries',
+                'ordering': ['location', 'year', 'month'],
+                'constraints': [models.UniqueConstraint(fields=('location', 'year', 'month'), name='unique_rent_summary_period')],
+            },
+        ),
+        migrations.RunPython(populate_rent_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:12
+
+import django.db.models.functions.datetime
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def period_fields(model_name, date_field):
+    # Django can't alter a regular column into a generated one, so the old
+    # columns are dropped and re-added as stored generated columns
+    return [
+        migrations.RemoveField(model_name=model_name, name='year'),
+        migrations.RemoveField(model_name=model_name, name='month'),
+        migrations.AddField(
+            model_name=model_name,
+            name='year',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractYear(date_field), output_field=models.PositiveIntegerField()),
+        ),
+        migrations.AddField(
+            model_name=model_name,
+            name='month',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractMonth(date_field), output_field=models.PositiveIntegerField()),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0008_rentmonthlysummary'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='shoprent',
+            name='unique_shop_rent_period',
+        ),
+        migrations.RemoveIndex(
+            model_name='shoprent',
+            name='shoprent_period_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_period_idx',
+        ),
+        migrations.RemoveField(model_name='shoprent', name='final_amount'),
+        migrations.AddField(
+            model_name='shoprent',
+            name='final_amount',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(is_percentage=True, then=models.F('amount') - models.F('amount') * models.F('discount') * models.Value(Decimal('0.01'))), default=models.F('amount') - models.F('discount')), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        *period_fields('shoprent', 'rent_date'),
+        *period_fields('shoppayment', 'payment_date'),
+        *period_fields('expense', 'expense_date'),
+        *period_fields('partnerpayment', 'payment_date'),
+        migrations.AddConstraint(
+            model_name='shoprent',
+            constraint=models.UniqueConstraint(fields=('shop', 'year', 'month'), name='unique_shop_rent_period'),
+        ),
+        migrations.AddIndex(
+            model_name='shoprent',
+            index=models.Index(fields=['year', 'month'], name='shoprent_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['year', 'month'], name='expense_period_idx'),
+        ),
+    ]
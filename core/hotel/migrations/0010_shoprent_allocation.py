@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:56
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def allocate_payments(apps, schema_editor):
+    ShopRent = apps.get_model('hotel', 'ShopRent')
+    ShopPayment = apps.get_model('hotel', 'ShopPayment')
+
+    paid = dict(ShopPayment.objects.order_by().values('shop_id').annotate(total=Sum('amount')).values_list('shop_id', 'total'))
+    changed = []
+    shop_id = credit = None
+    for rent in ShopRent.objects.order_by('shop_id', 'rent_date', 'id').only('id', 'shop_id', 'final_amount').iterator(chunk_size=2000):
+        if rent.shop_id != shop_id:
+            shop_id = rent.shop_id
+            credit = paid.get(shop_id) or Decimal('0')
+        applied = max(min(credit, rent.final_amount), Decimal('0'))
+        credit -= applied
+        rent.paid_amount, rent.is_settled = applied, applied >= rent.final_amount
+        changed.append(rent)
+    ShopRent.objects.bulk_update(changed, ['paid_amount', 'is_settled'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0009_generated_period_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoprent',
+            name='is_settled',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='shoprent',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='shoprent',
+            index=models.Index(fields=['shop', 'is_settled', 'rent_date'], name='shoprent_open_idx'),
+        ),
+        migrations.RunPython(allocate_payments, migrations.RunPython.noop),
+    ]
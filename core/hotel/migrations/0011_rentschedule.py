@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0010_shoprent_allocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_increment', models.BooleanField(default=False)),
+                ('detail', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='hotel.shopdetail')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rent_schedule', to='hotel.shop')),
+            ],
+            options={
+                'verbose_name': 'Rent Schedule',
+                'verbose_name_plural': 'Rent Schedules',
+                'ordering': ['detail', 'year', 'month'],
+                'indexes': [models.Index(fields=['year', 'month', 'shop'], name='rentschedule_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('detail', 'year', 'month'), name='unique_rent_schedule_period')],
+            },
+        ),
+    ]
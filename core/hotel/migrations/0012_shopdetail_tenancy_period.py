@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:02
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def close_tenancies(apps, schema_editor):
+    """
+    Each tenancy ends the day before the shop's next one starts; the last
+    one stays running and becomes the shop's current tenancy. Schedule rows
+    past a tenancy's new end are dropped.
+    """
+    Shop = apps.get_model('hotel', 'Shop')
+    ShopDetail = apps.get_model('hotel', 'ShopDetail')
+    RentSchedule = apps.get_model('hotel', 'RentSchedule')
+
+    closed, current = [], {}
+    previous = None
+    for detail in ShopDetail.objects.order_by('shop_id', 'start_date', 'id').only('id', 'shop_id', 'start_date').iterator(chunk_size=2000):
+        if previous is not None and previous.shop_id == detail.shop_id:
+            previous.end_date = max(detail.start_date - timedelta(days=1), previous.start_date)
+            closed.append(previous)
+        current[detail.shop_id] = detail.pk
+        previous = detail
+    ShopDetail.objects.bulk_update(closed, ['end_date'], batch_size=500)
+
+    for detail in closed:
+        end = detail.end_date
+        RentSchedule.objects.filter(detail_id=detail.pk).filter(
+            Q(year__gt=end.year) | Q(year=end.year, month__gt=end.month),
+        ).delete()
+    shops = list(Shop.objects.filter(pk__in=list(current)).only('id'))
+    for shop in shops:
+        shop.current_detail_id = current[shop.pk]
+    Shop.objects.bulk_update(shops, ['current_detail'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0011_rentschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='current_detail',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hotel.shopdetail'),
+        ),
+        migrations.AddField(
+            model_name='shopdetail',
+            name='end_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='shopdetail',
+            index=models.Index(fields=['shop', 'start_date', 'end_date'], name='shopdetail_interval_idx'),
+        ),
+        migrations.RunPython(close_tenancies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from datetime import date
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def record_initial_status(apps, schema_editor):
+    """
+    Seed each shop's status history: let from its first tenancy if it has
+    one, and its current status from today when that differs. The tenancy
+    intervals fill in the vacant gaps between lets.
+    """
+    Shop = apps.get_model('hotel', 'Shop')
+    ShopStatusChange = apps.get_model('hotel', 'ShopStatusChange')
+
+    today = date.today()
+    changes = []
+    for shop in Shop.objects.annotate(first_let=Min('details__start_date')).iterator(chunk_size=2000):
+        created_on = timezone.localdate(shop.created_at)
+        if shop.first_let:
+            changes.append(ShopStatusChange(shop_id=shop.pk, status='rent', changed_on=min(shop.first_let, created_on)))
+            if shop.status != 'rent':
+                changes.append(ShopStatusChange(shop_id=shop.pk, status=shop.status, changed_on=max(today, shop.first_let)))
+        else:
+            changes.append(ShopStatusChange(shop_id=shop.pk, status=shop.status, changed_on=created_on))
+    ShopStatusChange.objects.bulk_create(changes, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0012_shopdetail_tenancy_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(choices=[('second', 'Second Floor'), ('second-cab', 'Second Floor Cabinet'), ('third', 'Third Floor'), ('third-cab', 'Third Floor Cabinet')], max_length=10)),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('rented', models.IntegerField(default=0)),
+                ('empty', models.IntegerField(default=0)),
+                ('sold', models.IntegerField(default=0)),
+                ('vacant_days', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Occupancy Monthly Summary',
+                'verbose_name_plural': 'Occupancy Monthly Summaries',
+                'ordering': ['location', 'year', 'month'],
+                'constraints': [models.UniqueConstraint(fields=('location', 'year', 'month'), name='unique_occupancy_summary_period')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('rent', 'Rent'), ('sold', 'Sold'), ('empty', 'Empty')], max_length=10)),
+                ('changed_on', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='hotel.shop')),
+            ],
+            options={
+                'verbose_name': 'Shop Status Change',
+                'verbose_name_plural': 'Shop Status Changes',
+                'ordering': ['shop', 'changed_on', 'id'],
+                'indexes': [models.Index(fields=['shop', 'changed_on'], name='shopstatus_shop_day_idx')],
+            },
+        ),
+        # the occupancy rollup itself is built on first use (OccupancyMonthlySummary.ensure_current)
+        migrations.RunPython(record_initial_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0013_shop_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='shoprent',
+            constraint=models.CheckConstraint(condition=models.Q(('discount__gte', 0), models.Q(models.Q(('discount__lte', 100), ('is_percentage', True)), models.Q(('discount__lte', models.F('amount')), ('is_percentage', False)), _connector='OR')), name='shoprent_discount_in_range', violation_error_message='The discount must be between 0 and 100% or the rent amount.'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def clear_occupancy_summary(apps, schema_editor):
+    # the summary is now grouped from ShopOccupancyMonth; drop the old rows so
+    # OccupancyMonthlySummary.ensure_current rebuilds both on first use
+    apps.get_model('hotel', 'OccupancyMonthlySummary').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0014_shoprent_discount_in_range'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopOccupancyMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(choices=[('second', 'Second Floor'), ('second-cab', 'Second Floor Cabinet'), ('third', 'Third Floor'), ('third-cab', 'Third Floor Cabinet')], max_length=10)),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('state', models.CharField(choices=[('rent', 'Rent'), ('sold', 'Sold'), ('empty', 'Empty')], max_length=10)),
+                ('vacant_days', models.IntegerField(default=0)),
+                ('shop', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='hotel.shop')),
+            ],
+            options={
+                'verbose_name': 'Shop Occupancy Month',
+                'verbose_name_plural': 'Shop Occupancy Months',
+                'ordering': ['shop_id', 'year', 'month'],
+                'indexes': [models.Index(fields=['location', 'year', 'month'], name='shopoccupancy_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('shop', 'year', 'month'), name='unique_shop_occupancy_month')],
+            },
+        ),
+        migrations.RunPython(clear_occupancy_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # the shared DatabaseCache (settings.CACHES) backs the filter choices and
+    # year indexes; create its table here so a plain `migrate` is enough to
+    # deploy. createcachetable skips tables that already exist and backends
+    # that are not database caches.
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0015_shop_occupancy_month'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,20 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, Q
-from decimal import Decimal
-from datetime import date
+from django.db.models import Sum, Max, Count, Q, F, OuterRef, Subquery, Value, DecimalField, Window, Case, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from core.years import invalidate_year_index, period_columns
+from django.utils import timezone
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import date, timedelta
+from bisect import bisect_right
+from collections import defaultdict
+import calendar
+import threading
+
 
 User = get_user_model()
 
@@ -37,6 +49,43 @@ class Tenant(models.Model):
         verbose_name_plural = 'Tenants'
         verbose_name = 'Tenant'
 
+class ShopQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate each shop with its rent/payment history totals as correlated
+        subqueries: `billed_total` (sum of final_amount),
+        `paid_total`, `last_rent_on` and `last_payment_on`.
+        """
+        money = DecimalField(max_digits=12, decimal_places=2)
+        zero = Value(Decimal('0'), output_field=money)
+        rents = ShopRent.objects.filter(shop=OuterRef('pk')).order_by().values('shop')
+        payments = ShopPayment.objects.filter(shop=OuterRef('pk')).order_by().values('shop')
+        return self.annotate(
+            billed_total=Coalesce(
+                Subquery(rents.annotate(total=Sum('final_amount')).values('total'), output_field=money),
+                zero,
+            ),
+            paid_total=Coalesce(
+                Subquery(payments.annotate(total=Sum('amount')).values('total'), output_field=money),
+                zero,
+            ),
+            last_rent_on=Subquery(rents.annotate(last=Max('rent_date')).values('last')),
+            last_payment_on=Subquery(payments.annotate(last=Max('payment_date')).values('last')),
+        )
+
+    def with_balance(self):
+        """
+        Annotate each shop with `balance_amount`: total rents - total payments,
+        computed from the full history in a single query.
+        """
+        return self.with_totals().annotate(
+            balance_amount=models.ExpressionWrapper(
+                F('billed_total') - F('paid_total'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+
 class Shop(models.Model):
     STATUS_CHOICES = [
         ('rent', 'Rent'),
@@ -56,6 +105,11 @@ class Shop(models.Model):
     sold_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     detail = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # the running tenancy, kept in step by the ShopDetail signals
+    current_detail = models.ForeignKey('ShopDetail', on_delete=models.SET_NULL, null=True, blank=True,
+                                       editable=False, related_name='+')
+
+    objects = ShopQuerySet.as_manager()
     
     def __str__(self):
         return self.shop_no
@@ -68,15 +122,20 @@ class Shop(models.Model):
     def get_balance(self):
         """
         Return total outstanding balance for this shop:
-        total rents (use final_amount when present else amount) - total payments
+        total rents (final_amount) - total payments.
+        Read from the denormalized ShopBalance row, building it on first use.
         """
-        total_final = self.rents.filter(final_amount__isnull=False).aggregate(total=Sum('final_amount'))['total'] or Decimal('0')
-        total_amounts = self.rents.filter(final_amount__isnull=True).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        total_rents = (total_final or Decimal('0')) + (total_amounts or Decimal('0'))
+        try:
+            return self.balance_record.outstanding
+        except ShopBalance.DoesNotExist:
+            ShopBalance.rebuild(shop_ids=[self.pk])
+            return ShopBalance.objects.get(shop=self).outstanding
 
-        total_payments = self.payments.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+class ShopDetailQuerySet(models.QuerySet):
+    def active_on(self, day):
+        """Tenancies running on `day`: started by then and not yet ended."""
+        return self.filter(Q(end_date__isnull=True) | Q(end_date__gte=day), start_date__lte=day)
 
-        return (total_rents or Decimal('0')) - (total_payments or Decimal('0'))
 
 class ShopDetail(models.Model):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='details')
@@ -86,14 +145,176 @@ class ShopDetail(models.Model):
     security_amount = models.DecimalField(max_digits=10, decimal_places=2)
     increment = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     start_date = models.DateField()
+    # last day of the tenancy; blank while it is running. Adding a newer
+    # tenancy for the shop closes the running one the day before it starts.
+    end_date = models.DateField(null=True, blank=True)
     detail = models.TextField(blank=True)
 
+    objects = ShopDetailQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.shop.shop_no} - {self.tenant.name}"
 
+    def clean(self):
+        if self.end_date and self.start_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': 'End date cannot be before the start date.'})
+        if self.shop_id and self.start_date:
+            # a running tenancy that started earlier is closed automatically on save;
+            # anything else that overlaps this interval is a conflict
+            overlapping = ShopDetail.objects.filter(shop_id=self.shop_id).exclude(pk=self.pk).filter(
+                Q(end_date__isnull=True) | Q(end_date__gte=self.start_date),
+            ).exclude(end_date__isnull=True, start_date__lt=self.start_date)
+            if self.end_date:
+                overlapping = overlapping.filter(start_date__lte=self.end_date)
+            if overlapping.exists():
+                raise ValidationError('This tenancy overlaps another tenancy of the same shop.')
+
+    @classmethod
+    def refresh_current(cls, shop_ids):
+        """Point each shop's current_detail at its running tenancy (latest start), or clear it."""
+        current = {}
+        for shop_id, pk in (
+            cls.objects.filter(shop_id__in=shop_ids, end_date__isnull=True)
+            .order_by('shop_id', '-start_date', '-id').values_list('shop_id', 'pk')
+        ):
+            current.setdefault(shop_id, pk)
+        for shop_id in shop_ids:
+            Shop.objects.filter(pk=shop_id).update(current_detail_id=current.get(shop_id))
+
     class Meta:
         verbose_name_plural = 'Shop Details'
         verbose_name = 'Shop Detail'
+        indexes = [
+            models.Index(fields=['shop', 'start_date', 'end_date'], name='shopdetail_interval_idx'),
+        ]
+
+
+## RentSchedule Model (effective monthly rent per ShopDetail)
+class RentSchedule(models.Model):
+    """
+    Precomputed rent per ShopDetail and (year, month), from the detail's
+    start month up to a horizon. The increment compounds once per full year
+    of tenancy. Rent generation reads these rows instead of doing per-row
+    date arithmetic, so any month (past or future) is billed at its own rate.
+    """
+    # how far past the current month schedules are built by default
+    MONTHS_AHEAD = 24
+
+    detail = models.ForeignKey(ShopDetail, on_delete=models.CASCADE, related_name='schedule')
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='rent_schedule')
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    is_increment = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.detail} {self.year}-{self.month:02d}: {self.amount}"
+
+    class Meta:
+        ordering = ['detail', 'year', 'month']
+        verbose_name_plural = 'Rent Schedules'
+        verbose_name = 'Rent Schedule'
+        constraints = [
+            models.UniqueConstraint(fields=['detail', 'year', 'month'], name='unique_rent_schedule_period'),
+        ]
+        indexes = [
+            models.Index(fields=['year', 'month', 'shop'], name='rentschedule_period_idx'),
+        ]
+
+    @classmethod
+    def default_horizon(cls):
+        today = date.today()
+        months = today.year * 12 + today.month - 1 + cls.MONTHS_AHEAD
+        return (months // 12, months % 12 + 1)
+
+    @classmethod
+    def build(cls, detail_ids=None, until=None, batch_size=1000):
+        """
+        (Re)build the schedule of the given details (all when None) from
+        each start month through `until` (a (year, month) tuple, default
+        MONTHS_AHEAD from now) or the tenancy's end month, whichever is
+        first. Returns the number of rows written.
+        """
+        until_year, until_month = until or cls.default_horizon()
+        details = ShopDetail.objects.order_by('pk')
+        existing = cls.objects.all()
+        if detail_ids is not None:
+            details = details.filter(pk__in=detail_ids)
+            existing = existing.filter(detail_id__in=detail_ids)
+
+        def rows():
+            for detail_id, shop_id, rent_amount, increment, start_date, end_date in (
+                details.values_list('pk', 'shop_id', 'rent_amount', 'increment', 'start_date', 'end_date').iterator()
+            ):
+                rate = 1 + (increment or Decimal('0')) / 100
+                year, month = start_date.year, start_date.month
+                last = (until_year, until_month)
+                if end_date:
+                    last = min(last, (end_date.year, end_date.month))
+                elapsed = 0
+                while (year, month) <= last:
+                    full_years = elapsed // 12
+                    yield cls(
+                        detail_id=detail_id, shop_id=shop_id, year=year, month=month,
+                        amount=(rent_amount * rate ** full_years).quantize(Decimal('0.01')),
+                        is_increment=full_years > 0 and rate > 1,
+                    )
+                    year, month = next_period(year, month)
+                    elapsed += 1
+
+        written = 0
+        with transaction.atomic():
+            existing.delete()
+            batch = []
+            for row in rows():
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    cls.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            cls.objects.bulk_create(batch)
+            written += len(batch)
+        return written
+
+    @classmethod
+    def extend_to(cls, year, month):
+        """Build schedules for tenancies running in (year, month) that have no row for it yet."""
+        next_year, next_month = next_period(year, month)
+        missing = list(
+            ShopDetail.objects.filter(start_date__lt=date(next_year, next_month, 1))
+            .filter(Q(end_date__isnull=True) | Q(end_date__gte=date(year, month, 1)))
+            .filter(~models.Exists(cls.objects.filter(detail=OuterRef('pk'), year=year, month=month)))
+            .values_list('pk', flat=True)
+        )
+        if missing:
+            cls.build(detail_ids=missing, until=max((year, month), cls.default_horizon()))
+
+    @classmethod
+    def rents_for_period(cls, year, month, location=None):
+        """
+        One row per shop let in (year, month): the schedule of the tenancy
+        running that month (the later one if a handover falls in it),
+        joined in a single ordered query. Schedules stop at a tenancy's
+        end, so a shop is never billed for two tenants, and a past month
+        is billed even if the shop has been vacated since; the shop's
+        current status is not consulted.
+        Yields (shop_id, location, amount, is_increment).
+        """
+        cls.extend_to(year, month)
+        rows = cls.objects.filter(year=year, month=month)
+        if location:
+            rows = rows.filter(shop__location=location)
+        rows = (
+            rows.order_by('shop_id', '-detail__start_date', '-detail_id')
+            .values_list('shop_id', 'shop__location', 'amount', 'is_increment')
+        )
+        seen = set()
+        for shop_id, shop_location, amount, is_increment in rows.iterator():
+            # a shop can have several details (tenants); bill it once, from the latest
+            if shop_id in seen:
+                continue
+            seen.add(shop_id)
+            yield shop_id, shop_location, amount, is_increment
     
 class ShopRent(models.Model):
    
@@ -102,25 +323,142 @@ class ShopRent(models.Model):
     is_increment = models.BooleanField(default=False)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_percentage = models.BooleanField(default=False)
-    final_amount = models.DecimalField(max_digits=10, decimal_places=2, editable=False, null=True, blank=True)
+    # amount less the discount (a percentage of amount when is_percentage)
+    final_amount = models.GeneratedField(
+        expression=Case(
+            When(is_percentage=True, then=F('amount') - F('amount') * F('discount') * Value(Decimal('0.01'))),
+            default=F('amount') - F('discount'),
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
     rent_date = models.DateField()
-    year = models.PositiveIntegerField(editable=False)
-    month = models.PositiveIntegerField(editable=False)
+    year, month = period_columns('rent_date')
+    # share of the shop's payments allocated to this rent, oldest rent first
+    paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    is_settled = models.BooleanField(default=False, editable=False)
+
+    @staticmethod
+    def compute_final_amount(amount, discount, is_percentage):
+        """Python mirror of the final_amount column, for rows not yet (re)loaded."""
+        discount = discount or Decimal('0')
+        if is_percentage:
+            discount = amount * discount / 100
+        # MySQL rounds decimal halves away from zero, not to even
+        return (amount - discount).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    def clean(self):
+        # year/month are not form fields, so check the unique period here
+        # instead of letting the database constraint raise on save
+        if self.rent_date and self.shop_id:
+            duplicate = ShopRent.objects.filter(
+                shop_id=self.shop_id, year=self.rent_date.year, month=self.rent_date.month,
+            ).exclude(pk=self.pk)
+            if duplicate.exists():
+                raise ValidationError({'rent_date': 'A rent for this shop and month already exists.'})
+
+    @classmethod
+    def check_discount(cls, queryset, discount, is_percentage):
+        """
+        Raise ValidationError unless `discount` keeps every rent in `queryset`
+        at or above zero: at most 100 as a percentage, at most the smallest
+        amount as a flat discount.
+        """
+        if discount < 0:
+            raise ValidationError('The discount must not be negative.')
+        if is_percentage:
+            if discount > 100:
+                raise ValidationError('A percentage discount must not exceed 100.')
+        elif queryset.filter(amount__lt=discount).exists():
+            raise ValidationError('A flat discount must not exceed the rent amount.')
+
+    @classmethod
+    def apply_discount(cls, queryset, discount, is_percentage, refresh=True):
+        """
+        Set the discount on every rent in `queryset` with a single UPDATE;
+        the database regenerates final_amount. Rows already carrying this
+        discount are left alone. Raises ValidationError when the discount
+        would take a rent below zero (see check_discount). Returns (changed
+        count, affected (shop_id, year, month) keys); with refresh, the
+        derived tables for those keys are refreshed before returning.
+        """
+        cls.check_discount(queryset, discount, is_percentage)
+        changed = queryset.exclude(discount=discount, is_percentage=is_percentage)
+        affected = set(changed.order_by().values_list('shop_id', 'year', 'month').distinct())
+        if not affected:
+            return 0, affected
+        with transaction.atomic():
+            count = changed.update(discount=discount, is_percentage=is_percentage)
+            if refresh:
+                refresh_derived_totals(
+                    shop_ids={shop_id for shop_id, _, _ in affected},
+                    periods={(year, month) for _, year, month in affected},
+                )
+        return count, affected
+
+    @staticmethod
+    def settled(paid_amount, final_amount):
+        """A rent is settled once its allocation covers final_amount, so a fully discounted rent always is."""
+        return paid_amount >= final_amount
+
+    @classmethod
+    def allocate(cls, shop_id, amount=None):
+        """
+        Apply `amount` to the shop's open rents oldest first, touching only
+        the rents it reaches. With no amount, apply the shop's unallocated
+        credit (payments not yet matched to a rent). Open rents that need
+        nothing more (a 100% discount) are settled whether reached or not,
+        as reconcile does. Returns what is left over.
+        """
+        if amount is None:
+            paid = ShopPayment.objects.filter(shop_id=shop_id).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            allocated = cls.objects.filter(shop_id=shop_id).aggregate(total=Sum('paid_amount'))['total'] or Decimal('0')
+            amount = paid - allocated
+        changed = []
+        open_rents = cls.objects.filter(shop_id=shop_id, is_settled=False).order_by('rent_date', 'id')
+        for rent in open_rents.only('id', 'final_amount', 'paid_amount'):
+            if amount <= 0:
+                break
+            applied = min(amount, max(rent.final_amount - rent.paid_amount, Decimal('0')))
+            rent.paid_amount += applied
+            rent.is_settled = cls.settled(rent.paid_amount, rent.final_amount)
+            amount -= applied
+            changed.append(rent)
+        cls.objects.bulk_update(changed, ['paid_amount', 'is_settled'])
+        # cls.settled in SQL, for the open rents the amount did not reach
+        open_rents.filter(paid_amount__gte=F('final_amount')).update(is_settled=True)
+        return amount
+
+    @classmethod
+    def reconcile(cls, shop_ids=None, batch_size=500):
+        """
+        Re-run the allocation from scratch: each shop's total payments are
+        spread over its rents in (rent_date, id) order in one streaming pass.
+        Only rows whose allocation changes are written. Returns that count.
+        """
+        rents = cls.objects.order_by('shop_id', 'rent_date', 'id').only('id', 'shop_id', 'final_amount', 'paid_amount', 'is_settled')
+        payments = ShopPayment.objects.order_by().values('shop_id').annotate(total=Sum('amount'))
+        if shop_ids is not None:
+            rents = rents.filter(shop_id__in=shop_ids)
+            payments = payments.filter(shop_id__in=shop_ids)
+        paid = dict(payments.values_list('shop_id', 'total'))
+
+        changed = []
+        shop_id = credit = None
+        for rent in rents.iterator(chunk_size=2000):
+            if rent.shop_id != shop_id:
+                shop_id = rent.shop_id
+                credit = paid.get(shop_id) or Decimal('0')
+            applied = max(min(credit, rent.final_amount), Decimal('0'))
+            credit -= applied
+            settled = cls.settled(applied, rent.final_amount)
+            if rent.paid_amount != applied or rent.is_settled != settled:
+                rent.paid_amount, rent.is_settled = applied, settled
+                changed.append(rent)
+        with transaction.atomic():
+            cls.objects.bulk_update(changed, ['paid_amount', 'is_settled'], batch_size=batch_size)
+        return len(changed)
 
-    def save(self, *args, **kwargs):
-        if self.rent_date:
-            self.year = self.rent_date.year
-            self.month = self.rent_date.month
-        
-        if self.amount and self.discount:
-            if self.is_percentage:
-                discount_amount = (self.amount * self.discount) / 100
-            else:
-                discount_amount = self.discount
-            self.final_amount = self.amount - discount_amount
-            
-        super().save(*args, **kwargs)
-    
     def get_month_name(self):
         import calendar
         return calendar.month_name[self.month] if self.month else ""
@@ -132,6 +470,56 @@ class ShopRent(models.Model):
         ordering = ['-rent_date']
         verbose_name_plural = 'Shop Rents'
         verbose_name = 'Shop Rent'
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'year', 'month'], name='unique_shop_rent_period'),
+            # the discount never takes final_amount below zero
+            models.CheckConstraint(
+                condition=Q(discount__gte=0) & (
+                    Q(is_percentage=True, discount__lte=100) | Q(is_percentage=False, discount__lte=F('amount'))
+                ),
+                name='shoprent_discount_in_range',
+                violation_error_message='The discount must be between 0 and 100% or the rent amount.',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['year', 'month'], name='shoprent_period_idx'),
+            models.Index(fields=['shop', 'is_settled', 'rent_date'], name='shoprent_open_idx'),
+        ]
+
+class ShopPaymentQuerySet(models.QuerySet):
+    def with_running_balance(self, pks=None):
+        """
+        Annotate each payment with the shop balance as of that payment:
+        rents dated up to payment_date minus the cumulative payments ordered
+        by (payment_date, id). Filter on shops only, not dates, before calling
+        this or the running sum will miss earlier payments. Pass `pks` to
+        return only those payments; the filter is applied after the window.
+        """
+        money = DecimalField(max_digits=12, decimal_places=2)
+        zero = Value(Decimal('0'), output_field=money)
+        rents_to_date = (
+            ShopRent.objects.filter(shop=OuterRef('shop'), rent_date__lte=OuterRef('payment_date'))
+            .order_by()
+            .values('shop')
+            .annotate(total=Sum('final_amount'))
+            .values('total')
+        )
+        qs = self.annotate(
+            billed_to_date=Coalesce(Subquery(rents_to_date, output_field=money), zero),
+            paid_to_date=Window(
+                Sum('amount'),
+                partition_by=[F('shop_id')],
+                order_by=[F('payment_date').asc(), F('id').asc()],
+                output_field=money,
+            ),
+        )
+        if pks is not None:
+            # a filter on a window annotation is applied to an outer query
+            # wrapped around the windowed one, so the running sum still reads
+            # the full history while only the requested rows come back
+            qs = qs.annotate(row_id=Window(Max('id'), partition_by=[F('id')])).filter(row_id__in=pks)
+        return qs
+
 
 class ShopPayment(models.Model):
 
@@ -144,17 +532,12 @@ class ShopPayment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_type = models.CharField(max_length=20, choices=PAYMENTTYPE_CHOICES, default='rent')
     payment_date = models.DateField()
-    year = models.PositiveIntegerField(editable=False)
-    month = models.PositiveIntegerField(editable=False)
+    year, month = period_columns('payment_date')
     comments = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    def save(self, *args, **kwargs):
-        if self.payment_date:
-            self.year = self.payment_date.year
-            self.month = self.payment_date.month
-        super().save(*args, **kwargs)
-    
+    objects = ShopPaymentQuerySet.as_manager()
+
     def get_month_name(self):
         import calendar
         return calendar.month_name[self.month] if self.month else ""
@@ -181,17 +564,10 @@ class Expense(models.Model):
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='other')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     expense_date = models.DateField()
-    year = models.PositiveIntegerField(editable=False)
-    month = models.PositiveIntegerField(editable=False)
+    year, month = period_columns('expense_date')
     comments = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    def save(self, *args, **kwargs):
-        if self.expense_date:
-            self.year = self.expense_date.year
-            self.month = self.expense_date.month
-        super().save(*args, **kwargs)
-    
     def get_month_name(self):
         import calendar
         return calendar.month_name[self.month] if self.month else ""
@@ -203,22 +579,18 @@ class Expense(models.Model):
         ordering = ['-expense_date']
         verbose_name_plural = 'Expenses'
         verbose_name = 'Expense'
+        indexes = [
+            models.Index(fields=['year', 'month'], name='expense_period_idx'),
+        ]
     
 
 class PartnerPayment(models.Model):
     partner = models.ForeignKey(Partner, on_delete=models.CASCADE, related_name='payments')
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     payment_date = models.DateField()
-    year = models.PositiveIntegerField(editable=False)
-    month = models.PositiveIntegerField(editable=False)
+    year, month = period_columns('payment_date')
     comments = models.TextField(blank=True)
     
-    def save(self, *args, **kwargs):
-        if self.payment_date:
-            self.year = self.payment_date.year
-            self.month = self.payment_date.month
-        super().save(*args, **kwargs)
-    
     def get_month_name(self):
         import calendar
         return calendar.month_name[self.month] if self.month else ""
@@ -232,6 +604,25 @@ class PartnerPayment(models.Model):
         verbose_name = 'Partner Payment'
 
 
+def period_q(start, end, prefix=''):
+    """
+    Q for rows whose (year, month) columns fall in the inclusive window
+    start..end, given as (year, month) tuples; either bound may be None.
+    Written as plain comparisons so a (year, month) index can be used.
+    """
+    year, month = f'{prefix}year', f'{prefix}month'
+    q = Q()
+    if start:
+        q &= Q(**{f'{year}__gt': start[0]}) | Q(**{year: start[0], f'{month}__gte': start[1]})
+    if end:
+        q &= Q(**{f'{year}__lt': end[0]}) | Q(**{year: end[0], f'{month}__lte': end[1]})
+    return q
+
+
+def next_period(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
 def current_year():
     return date.today().year
 
@@ -239,6 +630,10 @@ def current_month():
     return date.today().month
         
 class Bank(models.Model):
+    # the close covers ShopRent/Expense rows from (start_year, start_month)
+    # through (year, month) inclusive
+    start_year = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    start_month = models.PositiveIntegerField(null=True, blank=True, editable=False)
     year = models.PositiveIntegerField(default=current_year, editable=False)
     month = models.PositiveIntegerField(default=current_month, editable=False)
     total = models.DecimalField(max_digits=12, decimal_places=2)
@@ -250,7 +645,15 @@ class Bank(models.Model):
     # def get_month_name(self):
     #     import calendar
     #     return calendar.month_name[self.month] if self.month else ""
-    
+
+    @property
+    def period_start(self):
+        return (self.start_year, self.start_month) if self.start_year and self.start_month else None
+
+    @property
+    def period_end(self):
+        return (self.year, self.month)
+
     def __str__(self):
         # Ensure we always return a string (was returning an int)
         # Prefer a readable label; fall back to the default object repr if needed.
@@ -262,4 +665,680 @@ class Bank(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Banks'
-        verbose_name = 'Bank'
\ No newline at end of file
+        verbose_name = 'Bank'
+
+
+## ShopBalance Model (denormalized per-shop totals)
+class ShopBalance(models.Model):
+    shop = models.OneToOneField(Shop, on_delete=models.CASCADE, related_name='balance_record')
+    billed = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_rent_date = models.DateField(null=True, blank=True)
+    last_payment_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.shop.shop_no}: {self.outstanding}"
+
+    class Meta:
+        ordering = ['shop']
+        verbose_name_plural = 'Shop Balances'
+        verbose_name = 'Shop Balance'
+
+    @classmethod
+    def apply_delta(cls, shop_id, billed=Decimal('0'), paid=Decimal('0'), rent_date=None, payment_date=None):
+        """
+        Add billed/paid deltas to a shop's balance row with a single UPDATE.
+        Returns False when the row does not exist yet.
+        """
+        changes = {
+            'billed': F('billed') + billed,
+            'paid': F('paid') + paid,
+            'outstanding': F('outstanding') + billed - paid,
+        }
+        if rent_date:
+            changes['last_rent_date'] = Greatest(Coalesce('last_rent_date', Value(rent_date)), Value(rent_date))
+        if payment_date:
+            changes['last_payment_date'] = Greatest(Coalesce('last_payment_date', Value(payment_date)), Value(payment_date))
+        return cls.objects.filter(shop_id=shop_id).update(**changes) > 0
+
+    @classmethod
+    def refresh_last_dates(cls, shop_id):
+        """Recompute last rent/payment dates after a row was removed or moved."""
+        cls.objects.filter(shop_id=shop_id).update(
+            last_rent_date=Subquery(
+                ShopRent.objects.filter(shop_id=shop_id).order_by('-rent_date').values('rent_date')[:1]
+            ),
+            last_payment_date=Subquery(
+                ShopPayment.objects.filter(shop_id=shop_id).order_by('-payment_date').values('payment_date')[:1]
+            ),
+        )
+
+    @classmethod
+    def rebuild(cls, shop_ids=None, batch_size=500):
+        """
+        Reconcile balance rows with the rent/payment history in bulk.
+        Returns (created, updated) counts; unchanged rows are not written.
+        """
+        shops = Shop.objects.all()
+        if shop_ids is not None:
+            shops = shops.filter(pk__in=shop_ids)
+        totals = shops.with_totals().values_list('pk', 'billed_total', 'paid_total', 'last_rent_on', 'last_payment_on')
+
+        existing = {b.shop_id: b for b in cls.objects.filter(shop__in=shops)}
+        to_create, to_update = [], []
+        for shop_id, billed, paid, last_rent, last_payment in totals.iterator():
+            outstanding = billed - paid
+            values = dict(billed=billed, paid=paid, outstanding=outstanding,
+                          last_rent_date=last_rent, last_payment_date=last_payment)
+            record = existing.get(shop_id)
+            if record is None:
+                to_create.append(cls(shop_id=shop_id, **values))
+            elif any(getattr(record, k) != v for k, v in values.items()):
+                for k, v in values.items():
+                    setattr(record, k, v)
+                to_update.append(record)
+
+        cls.objects.bulk_create(to_create, batch_size=batch_size)
+        cls.objects.bulk_update(
+            to_update,
+            ['billed', 'paid', 'outstanding', 'last_rent_date', 'last_payment_date'],
+            batch_size=batch_size,
+        )
+        return len(to_create), len(to_update)
+
+
+## RentMonthlySummary Model (rollup per location and month)
+class RentMonthlySummary(models.Model):
+    location = models.CharField(max_length=10, choices=Shop.LOCATION_CHOICES)
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    billed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discounted = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    shop_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.get_location_display()} {self.year}-{self.month:02d}"
+
+    @property
+    def net(self):
+        return self.billed - self.discounted
+
+    class Meta:
+        ordering = ['location', 'year', 'month']
+        verbose_name_plural = 'Rent Monthly Summaries'
+        verbose_name = 'Rent Monthly Summary'
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'year', 'month'], name='unique_rent_summary_period'),
+        ]
+
+    @classmethod
+    def apply_delta(cls, location, year, month, billed=Decimal('0'), discounted=Decimal('0'),
+                    collected=Decimal('0'), shop_count=0):
+        """Add deltas to one (location, year, month) row with a single UPDATE."""
+        cls.objects.get_or_create(location=location, year=year, month=month)
+        cls.objects.filter(location=location, year=year, month=month).update(
+            billed=F('billed') + billed,
+            discounted=F('discounted') + discounted,
+            collected=F('collected') + collected,
+            shop_count=F('shop_count') + shop_count,
+        )
+
+    @classmethod
+    def rebuild(cls, locations=None, periods=None):
+        """
+        Regenerate rollup rows from ShopRent/ShopPayment with two grouped
+        queries, optionally limited to some locations and/or (year, month)
+        periods. Returns the number of rows written.
+        """
+        rents = ShopRent.objects.order_by()
+        payments = ShopPayment.objects.order_by()
+        existing = cls.objects.all()
+        if locations is not None:
+            rents = rents.filter(shop__location__in=locations)
+            payments = payments.filter(shop__location__in=locations)
+            existing = existing.filter(location__in=locations)
+        if periods is not None:
+            periods_q = Q(pk__in=[])
+            for year, month in periods:
+                periods_q |= Q(year=year, month=month)
+            rents = rents.filter(periods_q)
+            payments = payments.filter(periods_q)
+            existing = existing.filter(periods_q)
+
+        rows = {}
+        for r in rents.values('shop__location', 'year', 'month').annotate(
+            billed=Sum('amount'),
+            net=Sum('final_amount'),
+            shop_count=Count('id'),
+        ):
+            rows[(r['shop__location'], r['year'], r['month'])] = cls(
+                location=r['shop__location'], year=r['year'], month=r['month'],
+                billed=r['billed'], discounted=r['billed'] - r['net'], shop_count=r['shop_count'],
+            )
+        for p in payments.values('shop__location', 'year', 'month').annotate(collected=Sum('amount')):
+            key = (p['shop__location'], p['year'], p['month'])
+            row = rows.setdefault(key, cls(location=key[0], year=key[1], month=key[2]))
+            row.collected = p['collected']
+
+        with transaction.atomic():
+            existing.delete()
+            cls.objects.bulk_create(rows.values(), batch_size=500)
+        invalidate_year_index(cls)
+        return len(rows)
+
+
+
+## ShopStatusChange Model (history of Shop.status)
+class ShopStatusChange(models.Model):
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='status_changes')
+    status = models.CharField(max_length=10, choices=Shop.STATUS_CHOICES)
+    changed_on = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.shop} {self.get_status_display()} on {self.changed_on}"
+
+    class Meta:
+        ordering = ['shop', 'changed_on', 'id']
+        verbose_name_plural = 'Shop Status Changes'
+        verbose_name = 'Shop Status Change'
+        indexes = [
+            models.Index(fields=['shop', 'changed_on'], name='shopstatus_shop_day_idx'),
+        ]
+
+
+def _occupancy_months(first_day, horizon, changes, tenancies, status):
+    """
+    Yield ((year, month), month-end state, vacant days) for one shop from
+    first_day's month through horizon. The recorded status decides 'sold'
+    and 'empty'; a shop recorded as 'rent' is rented only while one of its
+    tenancies runs and empty in between.
+    """
+    change_days = [day for day, _ in changes]
+
+    def state_on(day):
+        index = bisect_right(change_days, day) - 1
+        recorded = changes[max(index, 0)][1] if changes else status
+        if recorded != 'rent':
+            return recorded
+        running = any(start <= day and (end is None or day <= end) for start, end in tenancies)
+        return 'rent' if running else 'empty'
+
+    # the state can only change on these days
+    bounds = {first_day}
+    bounds.update(day for day in change_days if first_day < day <= horizon)
+    for start, end in tenancies:
+        for day in (start, end and end + timedelta(days=1)):
+            if day and first_day < day <= horizon:
+                bounds.add(day)
+    starts = sorted(bounds)
+    states = [state_on(day) for day in starts]
+    ends = starts[1:] + [horizon + timedelta(days=1)]
+
+    year, month = first_day.year, first_day.month
+    first = 0
+    while (year, month) <= (horizon.year, horizon.month):
+        month_start = max(date(year, month, 1), first_day)
+        month_end = date(year, month, calendar.monthrange(year, month)[1])
+        while ends[first] <= month_start:
+            first += 1
+        vacant = 0
+        last = first
+        while last < len(starts) and starts[last] <= month_end:
+            if states[last] == 'empty':
+                vacant += (min(ends[last], month_end + timedelta(days=1)) - max(starts[last], month_start)).days
+            last += 1
+        yield (year, month), states[last - 1], vacant
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _occupancy_horizon():
+    # the rollup runs through the end of the current month
+    today = date.today()
+    return date(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
+
+
+## ShopOccupancyMonth Model (one shop's month-end state, the rows the summary groups)
+class ShopOccupancyMonth(models.Model):
+    """
+    One shop's month-end state and vacant days per month, replayed from its
+    status history and tenancies. OccupancyMonthlySummary groups these rows,
+    so a change to one shop only recomputes that shop's months.
+    """
+    # no database constraint: rows of a deleted shop are cleared by the next refresh
+    shop = models.ForeignKey(Shop, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    location = models.CharField(max_length=10, choices=Shop.LOCATION_CHOICES)
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    state = models.CharField(max_length=10, choices=Shop.STATUS_CHOICES)
+    vacant_days = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.shop_id} {self.year}-{self.month:02d}: {self.state}"
+
+    class Meta:
+        ordering = ['shop_id', 'year', 'month']
+        verbose_name_plural = 'Shop Occupancy Months'
+        verbose_name = 'Shop Occupancy Month'
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'year', 'month'], name='unique_shop_occupancy_month'),
+        ]
+        indexes = [
+            models.Index(fields=['location', 'year', 'month'], name='shopoccupancy_period_idx'),
+        ]
+
+    @classmethod
+    def replay(cls, shops):
+        """
+        Unsaved rows for every shop in the `shops` queryset from its first
+        known day through the end of the current month. History is read
+        with three queries.
+        """
+        horizon = _occupancy_horizon()
+        changes = defaultdict(list)
+        for shop_id, changed_on, status in (
+            ShopStatusChange.objects.filter(shop__in=shops)
+            .order_by('shop_id', 'changed_on', 'id').values_list('shop_id', 'changed_on', 'status').iterator()
+        ):
+            changes[shop_id].append((changed_on, status))
+        tenancies = defaultdict(list)
+        for shop_id, start_date, end_date in (
+            ShopDetail.objects.filter(shop__in=shops).values_list('shop_id', 'start_date', 'end_date').iterator()
+        ):
+            tenancies[shop_id].append((start_date, end_date))
+
+        for shop_id, location, status, created_at in shops.order_by('pk').values_list('pk', 'location', 'status', 'created_at').iterator():
+            first_day = min(
+                [timezone.localdate(created_at)]
+                + [day for day, _ in changes[shop_id][:1]]
+                + [start for start, _ in tenancies[shop_id]]
+            )
+            if first_day > horizon:
+                continue
+            for (year, month), state, vacant in _occupancy_months(
+                first_day, horizon, changes[shop_id], tenancies[shop_id], status,
+            ):
+                yield cls(shop_id=shop_id, location=location, year=year, month=month, state=state, vacant_days=vacant)
+
+
+## OccupancyMonthlySummary Model (rented/empty/sold shops per location and month)
+class OccupancyMonthlySummary(models.Model):
+    """
+    Month-end count of rented, empty and sold shops per location, plus the
+    shop-days spent vacant during the month, grouped from ShopOccupancyMonth.
+    Kept current by the Shop, ShopDetail and ShopStatusChange signals, which
+    apply the changed shops' differences once their transaction commits;
+    the current month is counted through its last day.
+    """
+    # Shop.status value -> count column
+    STATE_FIELDS = {'rent': 'rented', 'empty': 'empty', 'sold': 'sold'}
+
+    location = models.CharField(max_length=10, choices=Shop.LOCATION_CHOICES)
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    rented = models.IntegerField(default=0)
+    empty = models.IntegerField(default=0)
+    sold = models.IntegerField(default=0)
+    vacant_days = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.get_location_display()} {self.year}-{self.month:02d}"
+
+    @property
+    def total(self):
+        return self.rented + self.empty + self.sold
+
+    @property
+    def occupancy_rate(self):
+        # sold shops are out of the letting pool
+        lettable = self.rented + self.empty
+        return self.rented * 100 / lettable if lettable else 0
+
+    class Meta:
+        ordering = ['location', 'year', 'month']
+        verbose_name_plural = 'Occupancy Monthly Summaries'
+        verbose_name = 'Occupancy Monthly Summary'
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'year', 'month'], name='unique_occupancy_summary_period'),
+        ]
+
+    @classmethod
+    def _regroup(cls, locations=None):
+        """Replace the summary rows of `locations` (all when None) with counts grouped from ShopOccupancyMonth."""
+        facts = ShopOccupancyMonth.objects.order_by()
+        existing = cls.objects.all()
+        if locations is not None:
+            facts = facts.filter(location__in=locations)
+            existing = existing.filter(location__in=locations)
+        counts = {
+            field: Count('pk', filter=Q(state=state)) for state, field in cls.STATE_FIELDS.items()
+        }
+        rows = [
+            cls(**row)
+            for row in facts.values('location', 'year', 'month').annotate(vacant_days=Sum('vacant_days'), **counts)
+        ]
+        with transaction.atomic():
+            existing.delete()
+            cls.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
+
+    @classmethod
+    def rebuild(cls, locations=None):
+        """
+        Replay every shop of the given locations (all when None) into
+        ShopOccupancyMonth and regroup their summary rows. Returns the number
+        of summary rows written.
+        """
+        shops = Shop.objects.all()
+        facts = ShopOccupancyMonth.objects.all()
+        if locations is not None:
+            shops = shops.filter(location__in=locations)
+            facts = facts.filter(Q(location__in=locations) | Q(shop__in=shops))
+        with transaction.atomic():
+            facts.delete()
+            ShopOccupancyMonth.objects.bulk_create(ShopOccupancyMonth.replay(shops), batch_size=1000)
+            written = cls._regroup(locations=locations)
+        invalidate_year_index(cls)
+        return written
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Add {(location, year, month): {column: delta}} to the summary rows
+        with a single UPDATE, creating the missing rows first.
+        """
+        scope = cls.objects.filter(location__in={key[0] for key in deltas}, year__in={key[1] for key in deltas})
+        missing = set(deltas) - set(scope.values_list('location', 'year', 'month'))
+        cls.objects.bulk_create(
+            [cls(location=location, year=year, month=month) for location, year, month in missing],
+            batch_size=500, ignore_conflicts=True,
+        )
+        ids = {(location, year, month): pk for location, year, month, pk in scope.values_list('location', 'year', 'month', 'pk')}
+        changes = {}
+        for column in (*cls.STATE_FIELDS.values(), 'vacant_days'):
+            whens = [When(pk=ids[key], then=Value(delta[column])) for key, delta in deltas.items() if delta.get(column)]
+            if whens:
+                changes[column] = F(column) + Case(*whens, default=Value(0), output_field=models.IntegerField())
+        if changes:
+            cls.objects.filter(pk__in=[ids[key] for key in deltas]).update(**changes)
+
+    @classmethod
+    def refresh_shops(cls, shop_ids):
+        """
+        Replay only the given shops and apply the difference from their
+        stored ShopOccupancyMonth rows to the summary; deleted shops drop
+        out. Does nothing until the rollup has been built for the current
+        month (ensure_current builds it whole). Returns the number of
+        shop-month rows changed.
+        """
+        today = date.today()
+        if not cls.objects.filter(year=today.year, month=today.month).exists():
+            return 0
+        shop_ids = set(shop_ids)
+        state = lambda row: (row.location, row.state, row.vacant_days)
+        old = {(r.shop_id, r.year, r.month): r for r in ShopOccupancyMonth.objects.filter(shop_id__in=shop_ids)}
+        new = {(r.shop_id, r.year, r.month): r for r in ShopOccupancyMonth.replay(Shop.objects.filter(pk__in=shop_ids))}
+        stale = [row for key, row in old.items() if key not in new or state(new[key]) != state(row)]
+        fresh = [row for key, row in new.items() if key not in old or state(old[key]) != state(row)]
+        if not stale and not fresh:
+            return 0
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        for rows, sign in ((stale, -1), (fresh, 1)):
+            for row in rows:
+                delta = deltas[(row.location, row.year, row.month)]
+                delta[cls.STATE_FIELDS[row.state]] += sign
+                delta['vacant_days'] += sign * row.vacant_days
+        with transaction.atomic():
+            ShopOccupancyMonth.objects.filter(pk__in=[row.pk for row in stale]).delete()
+            ShopOccupancyMonth.objects.bulk_create(fresh, batch_size=1000)
+            cls.apply_deltas({key: delta for key, delta in deltas.items() if any(delta.values())})
+            # months no shop is counted in any more (a deleted or moved shop's)
+            cls.objects.filter(
+                location__in={location for location, _, _ in deltas}, year__in={year for _, year, _ in deltas},
+                rented=0, empty=0, sold=0,
+            ).delete()
+        invalidate_year_index(cls)
+        return len(stale) + len(fresh)
+
+    @classmethod
+    def ensure_current(cls):
+        """Rebuild once a new month has started, so the rollup always reaches it."""
+        today = date.today()
+        if not cls.objects.filter(year=today.year, month=today.month).exists() and Shop.objects.exists():
+            cls.rebuild()
+
+
+def refresh_derived_totals(shop_ids=None, periods=None):
+    """
+    Refresh the denormalized balance/rollup tables after writes that bypass
+    the save signals (bulk_create, queryset.update).
+    """
+    ShopBalance.rebuild(shop_ids=shop_ids)
+    RentMonthlySummary.rebuild(periods=periods)
+    ShopRent.reconcile(shop_ids=shop_ids)
+    invalidate_year_index(ShopRent)
+    invalidate_year_index(ShopPayment)
+
+
+def _rent_row(instance):
+    # final_amount is computed by the database; mirror it here rather than
+    # reloading the row (or reading a row that post_delete has already removed)
+    return dict(
+        shop_id=instance.shop_id, amount=instance.amount, rent_date=instance.rent_date,
+        final_amount=ShopRent.compute_final_amount(instance.amount, instance.discount, instance.is_percentage),
+    )
+
+
+@receiver(pre_save, sender=ShopRent)
+@receiver(pre_save, sender=ShopPayment)
+def remember_previous_values(sender, instance, **kwargs):
+    """Keep the stored row so post_save can apply the difference instead of re-summing history."""
+    instance._previous = None
+    if instance.pk:
+        fields = ('shop_id', 'amount', 'final_amount', 'rent_date') if sender is ShopRent else ('shop_id', 'amount', 'payment_date')
+        instance._previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def _update_balance_for_rent(previous, current):
+    if previous:
+        ShopBalance.apply_delta(previous['shop_id'], billed=-previous['final_amount'])
+    if current and not ShopBalance.apply_delta(current['shop_id'], billed=current['final_amount'], rent_date=current['rent_date']):
+        ShopBalance.rebuild(shop_ids=[current['shop_id']])
+    if previous and (not current or previous['shop_id'] != current['shop_id'] or previous['rent_date'] > current['rent_date']):
+        ShopBalance.refresh_last_dates(previous['shop_id'])
+
+
+def _update_balance_for_payment(previous, current):
+    if previous:
+        ShopBalance.apply_delta(previous['shop_id'], paid=-previous['amount'])
+    if current and not ShopBalance.apply_delta(current['shop_id'], paid=current['amount'], payment_date=current['payment_date']):
+        ShopBalance.rebuild(shop_ids=[current['shop_id']])
+    if previous and (not current or previous['shop_id'] != current['shop_id'] or previous['payment_date'] > current['payment_date']):
+        ShopBalance.refresh_last_dates(previous['shop_id'])
+
+
+def _shop_locations(*rows):
+    shop_ids = {r['shop_id'] for r in rows if r}
+    return dict(Shop.objects.filter(pk__in=shop_ids).values_list('pk', 'location'))
+
+
+def _update_summary_for_rent(previous, current):
+    locations = _shop_locations(previous, current)
+    for row, sign in ((previous, -1), (current, 1)):
+        if row and row['shop_id'] in locations:
+            billed = row['final_amount']
+            RentMonthlySummary.apply_delta(
+                locations[row['shop_id']], row['rent_date'].year, row['rent_date'].month,
+                billed=sign * row['amount'], discounted=sign * (row['amount'] - billed), shop_count=sign,
+            )
+
+
+def _update_summary_for_payment(previous, current):
+    locations = _shop_locations(previous, current)
+    for row, sign in ((previous, -1), (current, 1)):
+        if row and row['shop_id'] in locations:
+            RentMonthlySummary.apply_delta(
+                locations[row['shop_id']], row['payment_date'].year, row['payment_date'].month,
+                collected=sign * row['amount'],
+            )
+
+
+def _reconcile_for_rent(previous, current):
+    # a rent added after the shop's existing ones only draws on unallocated
+    # credit; anything else can shift the oldest-first allocation
+    if current and not previous and not ShopRent.objects.filter(
+        shop_id=current['shop_id'], rent_date__gt=current['rent_date'],
+    ).exists():
+        ShopRent.allocate(current['shop_id'])
+        return
+    ShopRent.reconcile(shop_ids={r['shop_id'] for r in (previous, current) if r})
+
+
+def _reconcile_for_payment(previous, current):
+    if current and not previous:
+        ShopRent.allocate(current['shop_id'], current['amount'])
+        return
+    ShopRent.reconcile(shop_ids={r['shop_id'] for r in (previous, current) if r})
+
+
+@receiver(post_save, sender=ShopRent)
+def shop_rent_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    current = _rent_row(instance)
+    _update_balance_for_rent(previous, current)
+    _update_summary_for_rent(previous, current)
+    _reconcile_for_rent(previous, current)
+
+
+@receiver(post_delete, sender=ShopRent)
+def shop_rent_deleted(sender, instance, **kwargs):
+    previous = _rent_row(instance)
+    _update_balance_for_rent(previous, None)
+    _update_summary_for_rent(previous, None)
+    _reconcile_for_rent(previous, None)
+
+
+@receiver(post_save, sender=ShopPayment)
+def shop_payment_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    current = dict(shop_id=instance.shop_id, amount=instance.amount, payment_date=instance.payment_date)
+    _update_balance_for_payment(previous, current)
+    _update_summary_for_payment(previous, current)
+    _reconcile_for_payment(previous, current)
+
+
+@receiver(post_delete, sender=ShopPayment)
+def shop_payment_deleted(sender, instance, **kwargs):
+    previous = dict(shop_id=instance.shop_id, amount=instance.amount, payment_date=instance.payment_date)
+    _update_balance_for_payment(previous, None)
+    _update_summary_for_payment(previous, None)
+    _reconcile_for_payment(previous, None)
+
+
+@receiver(pre_save, sender=Shop)
+def remember_previous_location(sender, instance, **kwargs):
+    instance._previous_location = instance._previous_status = None
+    if instance.pk:
+        instance._previous_location, instance._previous_status = (
+            Shop.objects.filter(pk=instance.pk).values_list('location', 'status').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Shop)
+def shop_saved(sender, instance, created, **kwargs):
+    # a shop's whole rent/payment history moves with it to the new location;
+    # regroup only the months it has rows in
+    previous = getattr(instance, '_previous_location', None)
+    if previous and previous != instance.location:
+        periods = set(instance.rents.values_list('year', 'month').distinct())
+        periods.update(ShopPayment.objects.filter(shop=instance).values_list('year', 'month').distinct())
+        if periods:
+            RentMonthlySummary.rebuild(locations=[previous, instance.location], periods=periods)
+        _refresh_occupancy(instance.pk)
+    if created:
+        # every shop has a balance row, so a missing one means the table is out of sync
+        ShopBalance.objects.get_or_create(shop_id=instance.pk)
+    if created or getattr(instance, '_previous_status', None) != instance.status:
+        ShopStatusChange.objects.create(shop=instance, status=instance.status, changed_on=date.today())
+
+
+@receiver(post_delete, sender=Shop)
+def shop_deleted(sender, instance, **kwargs):
+    _refresh_occupancy(instance.pk)
+
+
+# shops whose occupancy changed in this thread's running transaction
+_occupancy_pending = threading.local()
+
+
+def _refresh_occupancy(shop_id):
+    """
+    Refresh the shop's occupancy rows once the transaction commits. Every
+    write queues a callback, but the first to run handles all the shops
+    marked so far, so a batch (an admin save with inlines, an import) is
+    refreshed in one pass. Shops left marked by a rolled-back transaction
+    are just recomputed with the next one.
+    """
+    pending = getattr(_occupancy_pending, 'shop_ids', None)
+    if pending is None:
+        pending = _occupancy_pending.shop_ids = set()
+    pending.add(shop_id)
+    transaction.on_commit(_flush_occupancy)
+
+
+def _flush_occupancy():
+    shop_ids = getattr(_occupancy_pending, 'shop_ids', None)
+    if shop_ids:
+        _occupancy_pending.shop_ids = set()
+        OccupancyMonthlySummary.refresh_shops(shop_ids)
+
+
+@receiver(post_save, sender=ShopStatusChange)
+@receiver(post_delete, sender=ShopStatusChange)
+def shop_status_changed(sender, instance, **kwargs):
+    _refresh_occupancy(instance.shop_id)
+
+
+# Sidebar filter choices derived from ShopDetail/Shop/Tenant, cached until one changes
+SHOP_FILTER_CACHE_KEY = 'hotel:shopdetail-shop-choices'
+TENANT_FILTER_CACHE_KEY = 'hotel:shopdetail-tenant-choices'
+TENANT_COUNT_CACHE_KEY = 'hotel:tenant-count'
+FILTER_CACHE_TIMEOUT = 60 * 60
+
+
+@receiver(post_save, sender=ShopDetail)
+@receiver(post_delete, sender=ShopDetail)
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_filter_choices(sender, **kwargs):
+    cache.delete_many([SHOP_FILTER_CACHE_KEY, TENANT_FILTER_CACHE_KEY, TENANT_COUNT_CACHE_KEY])
+
+
+@receiver(post_save, sender=ShopDetail)
+def shop_detail_saved(sender, instance, **kwargs):
+    detail_ids = [instance.pk]
+    if instance.end_date is None:
+        # a newer running tenancy closes the one it replaces
+        replaced = ShopDetail.objects.filter(
+            shop_id=instance.shop_id, end_date__isnull=True, start_date__lt=instance.start_date,
+        ).exclude(pk=instance.pk)
+        replaced_ids = list(replaced.values_list('pk', flat=True))
+        if replaced_ids:
+            ShopDetail.objects.filter(pk__in=replaced_ids).update(end_date=instance.start_date - timedelta(days=1))
+            detail_ids += replaced_ids
+    ShopDetail.refresh_current([instance.shop_id])
+    # rent, increment or dates may have changed; recompute the affected schedules
+    RentSchedule.build(detail_ids=detail_ids)
+    _refresh_occupancy(instance.shop_id)
+
+
+@receiver(post_delete, sender=ShopDetail)
+def shop_detail_deleted(sender, instance, **kwargs):
+    ShopDetail.refresh_current([instance.shop_id])
+    _refresh_occupancy(instance.shop_id)
@@ -8,6 +8,7 @@ import io
 import json
 
 from project.models import PartyLedger, Party  # adjust if your model names differ
+from core.years import year_index
 
 
 class PartyLedgerReportAdminView:
@@ -70,8 +71,7 @@ class PartyLedgerReportAdminView:
             total_amount_all += amt
 
         # years dropdown
-        years_qs = PartyLedger.objects.dates('transaction_date', 'year').distinct()
-        years = [y.year for y in years_qs]
+        years = year_index(PartyLedger, 'transaction_date')
 
         context = dict(
             admin.site.each_context(request),
@@ -5,6 +5,7 @@ from django.template.response import TemplateResponse
 import datetime
 import io
 from project.models import PartyProjectLedger, Project, Party
+from core.years import year_index
 
 # Custom admin view for Party Project Ledger reports
 class PartyProjectLedgerReportAdminView:
@@ -100,8 +101,7 @@ class PartyProjectLedgerReportAdminView:
         projects = Project.objects.order_by('name')
         parties = Party.objects.order_by('name')
 
-        years_qs = PartyProjectLedger.objects.dates('transaction_date', 'year').distinct()
-        years = [y.year for y in years_qs]
+        years = year_index(PartyProjectLedger, 'transaction_date')
 
         # resolve selected names (for heading and PDF)
         selected_project_name = "Any"
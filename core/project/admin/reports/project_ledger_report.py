@@ -6,6 +6,7 @@ from django.http import HttpResponse
 from django.contrib import messages
 import io
 from project.models import ProjectLedger, Project
+from core.years import year_index
 
 
 # Custom admin view for Project Ledger reports
@@ -90,8 +91,7 @@ class ProjectLedgerReportAdminView:
 
         # dropdowns
         projects = Project.objects.order_by('name')
-        years_qs = ProjectLedger.objects.dates('transaction_date', 'year').distinct()
-        years = [y.year for y in years_qs]
+        years = year_index(ProjectLedger, 'transaction_date')
 
         context = dict(
             admin.site.each_context(request),
@@ -6,6 +6,7 @@ from project.models import Saddqah
 from django.http import HttpResponse
 from django.contrib import messages
 import io
+from core.years import year_index
 
 
 # Custom admin view for Saddqah reports
@@ -84,8 +85,7 @@ class SaddqahReportAdminView:
             total_amount += amount
         
         # dropdowns for years
-        years_qs = Saddqah.objects.dates('transaction_date', 'year').distinct()
-        years = [y.year for y in years_qs]
+        years = year_index(Saddqah, 'transaction_date')
         
 
         context = dict(